@@ -0,0 +1,91 @@
+import base64
+import json
+
+from django.core import exceptions
+
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from api.utils import param, param_int, ValidationError
+
+def encode_cursor(value):
+    data = json.dumps(value).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+def decode_cursor(cursor, field):
+    """
+    The value of the model field `field` which `cursor` encodes.
+    """
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(value, (int, str)):
+            raise ValueError
+        # eg a string cursor for an integer field, which would otherwise fail
+        # in the query
+        return field.clean(value, None)
+    except (ValueError, exceptions.ValidationError):
+        raise ValidationError("cursor parameter is invalid")
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pages through a list endpoint in the order of the view's `cursor_field`,
+    which must be unique.
+
+    By default, pages are selected with `limit` and `offset`, which we keep for
+    backwards compatability. But the database still has to read every row up
+    to the offset, so reading every page this way costs quadratic time in the
+    number of rows. If `cursor` is passed (empty for the first page), pages
+    instead start after the last row of the previous page, which the database
+    finds with an index, and can be much larger. The next page's cursor is
+    returned in the `X-Next-Cursor` header, and its url in the `Link` header.
+    The response body is the same either way.
+    """
+    default_limit = 100
+    max_offset_limit = 100
+    max_cursor_limit = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.next_cursor = None
+
+        field = view.cursor_field
+        queryset = queryset.order_by(field)
+
+        if "cursor" not in request.query_params:
+            limit = param_int(request, "limit", default=self.default_limit,
+                min_=0, max_=self.max_offset_limit)
+            offset = param_int(request, "offset", default=0, min_=0)
+            return list(queryset[offset:offset + limit])
+
+        if "offset" in request.query_params:
+            raise ValidationError("offset and cursor parameters can't be "
+                "used together")
+        limit = param_int(request, "limit", default=self.default_limit,
+            min_=0, max_=self.max_cursor_limit)
+        cursor = param(request, "cursor")
+        if cursor:
+            if field == "pk":
+                model_field = queryset.model._meta.pk
+            else:
+                model_field = queryset.model._meta.get_field(field)
+            after = decode_cursor(cursor, model_field)
+            queryset = queryset.filter(**{f"{field}__gt": after})
+
+        # fetch one more row than we return, to know if there's another page
+        page = list(queryset[:limit + 1])
+        if len(page) > limit:
+            page = page[:limit]
+            if page:
+                self.next_cursor = encode_cursor(getattr(page[-1], field))
+        return page
+
+    def get_paginated_response(self, data):
+        headers = {}
+        if self.next_cursor:
+            url = replace_query_param(self.request.build_absolute_uri(),
+                "cursor", self.next_cursor)
+            headers["X-Next-Cursor"] = self.next_cursor
+            headers["Link"] = f'<{url}>; rel="next"'
+        return Response(data, headers=headers)
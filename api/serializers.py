@@ -1,3 +1,6 @@
+from django.db.models import (Manager, F, ExpressionWrapper,
+    CharField as CharField_)
+
 from rest_framework.serializers import (ModelSerializer, Serializer,
     SerializerMethodField, RelatedField as _RelatedField, CharField,
     DateTimeField, ListSerializer, ManyRelatedField)
@@ -36,28 +39,54 @@ class ProfessorField(RelatedField):
 
 class ManyProfessorField(ManyRelatedField):
     def to_representation(self, iterable):
-        iterable = iterable.filter(status=Professor.Status.VERIFIED)
+        iterable = _filter_status(iterable, Professor.Status.VERIFIED)
         return super().to_representation(iterable)
 
-# only return verified reviews and professors
+def _filter_status(queryset, status):
+    if isinstance(queryset, Manager):
+        queryset = queryset.all()
+    # if the view prefetched these objects, filter the prefetched results
+    # instead of issuing a new query for each parent object.
+    if queryset._result_cache is not None:
+        return [obj for obj in queryset if obj.status == status]
+    return queryset.filter(status=status)
+
+class SparseFieldsMixin:
+    """
+    Takes a `fields` argument, the names of the only fields to serialize, or
+    None (the default) for every field.
+    """
+    # field name -> the name it's returned as, for serializers which rename
+    # fields in `to_representation`
+    renamed = {}
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in list(self.fields):
+                if self.renamed.get(name, name) not in fields:
+                    self.fields.pop(name)
+
+    @classmethod
+    def field_names(cls):
+        """
+        The names every field is returned as.
+        """
+        return [cls.renamed.get(name, name) for name in cls().fields]
+
+    @classmethod
+    def source_names(cls, fields):
+        """
+        The names of `fields` before they're renamed.
+        """
+        sources = {shown: name for (name, shown) in cls.renamed.items()}
+        return [sources.get(field, field) for field in fields]
+
+# only return verified reviews
 # https://stackoverflow.com/a/28354281/12164878
 class ReviewListSerializer(ListSerializer):
     def to_representation(self, data):
-        data = data.filter(status=Review.Status.VERIFIED)
-        return super().to_representation(data)
-
-class ProfessorListSerializer(ListSerializer):
-    def to_representation(self, data):
-        # one would expect to be able to write
-        # `data.filter(status=Professor.Status.VERIFIED)` here, but filtering an
-        # already-sliced queryset is prohibited by django due to ambiguity
-        # concerns: https://docs.djangoproject.com/en/3.2/ref/models/querysets/.
-        # I can't see how it would be ambiguous unless you did something like
-        # slice-filter-slice, but oh well.
-        # We should be careful in the future that this doesn't cause performance
-        # issues; this relies on slicing already having occured before we
-        # receive `data`, limiting it to a reasonable 100 professors.
-        data = [p for p in data if p.status == Professor.Status.VERIFIED]
+        data = _filter_status(data, Review.Status.VERIFIED)
         return super().to_representation(data)
 
 class ReviewsSerializer(ModelSerializer):
@@ -81,7 +110,7 @@ class ReviewsSerializer(ModelSerializer):
             response["expected_grade"] = ""
         return response
 
-class CourseSerializer(ModelSerializer):
+class CourseSerializer(SparseFieldsMixin, ModelSerializer):
     average_gpa = SerializerMethodField()
     professors = ProfessorField(many=True)
 
@@ -90,10 +119,13 @@ class CourseSerializer(ModelSerializer):
         exclude = ["created_at", "id"]
 
     def get_average_gpa(self, course):
+        # prefer the value annotated by `CourseQuerySet.average_gpa_annotate`
+        if hasattr(course, "average_gpa_"):
+            return course.average_gpa_
         return course.average_gpa()
 
 
-class ProfessorSerializer(ModelSerializer):
+class ProfessorSerializer(SparseFieldsMixin, ModelSerializer):
     courses = CourseField(many=True, source="course_set")
     average_rating = SerializerMethodField()
     type = SerializerMethodField()
@@ -101,9 +133,12 @@ class ProfessorSerializer(ModelSerializer):
     class Meta:
         model = Professor
         exclude = ["id", "status", "created_at"]
-        list_serializer_class = ProfessorListSerializer
 
     def get_average_rating(self, professor):
+        # prefer the value annotated by
+        # `ProfessorQuerySet.average_rating_annotate`
+        if hasattr(professor, "average_rating_"):
+            return professor.average_rating_
         return professor.average_rating
 
     def get_type(self, professor):
@@ -120,7 +155,7 @@ class CourseWithReviewsSerializer(CourseSerializer):
     reviews = ReviewsSerializer(many=True, source="review_set")
 
 
-class SearchResultSerializer(Serializer):
+class SearchResultSerializer(SparseFieldsMixin, Serializer):
     type = SerializerMethodField()
     name = CharField()
     slug = SerializerMethodField()
@@ -136,30 +171,76 @@ class SearchResultSerializer(Serializer):
         return result.slug
 
 
-class GradeSerializer(ModelSerializer):
+class GradeSerializer(SparseFieldsMixin, ModelSerializer):
     course = CourseField()
     professor = ProfessorField()
+    # maintain backwards compatability
+    renamed = {
+        "a_plus": "A+",
+        "a": "A",
+        "a_minus": "A-",
+        "b_plus": "B+",
+        "b": "B",
+        "b_minus": "B-",
+        "c_plus": "C+",
+        "c": "C",
+        "c_minus": "C-",
+        "d_plus": "D+",
+        "d": "D",
+        "d_minus": "D-",
+        "f": "F",
+        "w": "W",
+        "other": "Other"
+    }
 
     class Meta:
         model = Grade
         exclude = ["id", "num_students"]
 
-    # maintain backwards compatability
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data["A+"] = data.pop("a_plus")
-        data["A"] = data.pop("a")
-        data["A-"] = data.pop("a_minus")
-        data["B+"] = data.pop("b_plus")
-        data["B"] = data.pop("b")
-        data["B-"] = data.pop("b_minus")
-        data["C+"] = data.pop("c_plus")
-        data["C"] = data.pop("c")
-        data["C-"] = data.pop("c_minus")
-        data["D+"] = data.pop("d_plus")
-        data["D"] = data.pop("d")
-        data["D-"] = data.pop("d_minus")
-        data["F"] = data.pop("f")
-        data["W"] = data.pop("w")
-        data["Other"] = data.pop("other")
+        for (name, shown) in self.renamed.items():
+            if name in data:
+                data[shown] = data.pop(name)
         return data
+
+    @classmethod
+    def values(cls, grades, fields=None, *, key=None):
+        """
+        The same data as
+        `GradeSerializer(grades, many=True, fields=fields).data`, but read with
+        `values_list` and put straight into dicts, instead of building a
+        `Grade` (with a `Semester`, course and professor) for every row and
+        passing it through each serializer field. This is several times faster
+        for the thousands of grades of a large course.
+
+        If `key` (a column of `Grade`) is passed, returns `(key, data)` tuples
+        instead, for grouping the grades.
+        """
+        # returned name -> the column it's read from, in the order
+        # `GradeSerializer` returns them.
+        columns = {
+            "course": "course__name",
+            "professor": "professor__name",
+            "semester": "semester_",
+            "section": "section",
+            **{shown: name for (name, shown) in cls.renamed.items()}
+        }
+        if fields is not None:
+            columns = {field: column for (field, column) in columns.items()
+                if field in fields}
+
+        names = list(columns)
+        rows = (
+            grades
+            # read the semester as the plain string it's stored as, which is
+            # what `str(Semester)` would give us back, instead of parsing it
+            # with `SemesterField.from_db_value`.
+            .annotate(semester_=ExpressionWrapper(F("semester"),
+                output_field=CharField_()))
+            .values_list(*([key] if key else []), *columns.values())
+        )
+
+        if key:
+            return [(row[0], dict(zip(names, row[1:]))) for row in rows]
+        return [dict(zip(names, row)) for row in rows]
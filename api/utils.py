@@ -47,3 +47,35 @@ def param_bool(request, name, *, default=sentry):
         return val
 
     return val == "true"
+
+def param_list(request, name, *, default=sentry, max_length=None):
+    val = param(request, name, default=default)
+    if val == default:
+        return val
+
+    # drop empty items (eg from a trailing comma) and duplicates, keeping the
+    # order they were passed in
+    vals = list(dict.fromkeys(v.strip() for v in val.split(",") if v.strip()))
+    if not vals:
+        raise ValidationError(f"{name} parameter must not be empty")
+
+    if max_length is not None and len(vals) > max_length:
+        raise ValidationError(f"{name} parameter must have no more than "
+            f"{max_length} items")
+
+    return vals
+
+def param_fields(request, options):
+    """
+    The fields in the `fields` parameter, or None if it isn't passed.
+    """
+    fields = param_list(request, "fields", default=None)
+    if fields is None:
+        return None
+
+    for field in fields:
+        if field not in options:
+            raise ValidationError(f"fields parameter must only include "
+                f"{options}")
+
+    return fields
@@ -1,18 +1,24 @@
 from django.views.generic import TemplateView
 from django.urls import reverse
+from django.db.models import Prefetch
 
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 
 from home.models import (Course as CourseModel, Professor as ProfessorModel,
-    Grade as GradeModel)
+    Grade as GradeModel, Review as ReviewModel)
 from home import queries
-from home.utils import Semester
+from home.utils import Semester, cache_tag, data_version_condition
 from api.serializers import (CourseSerializer, ProfessorSerializer,
     ProfessorWithReviewsSerializer, CourseWithReviewsSerializer,
     SearchResultSerializer, GradeSerializer)
-from api.utils import param, param_int, param_bool, ValidationError
+from api.utils import (param, param_int, param_bool, param_list,
+    param_fields, ValidationError)
+from api.pagination import KeysetPagination
+
+# the most names a batch endpoint accepts at once
+MAX_BATCH_NAMES = 100
 
 
 class Docs(TemplateView):
@@ -28,97 +34,275 @@ class Meta(APIView):
         return Response(data)
 
 
+def wants(fields, name):
+    """
+    Whether the field `name` is in the `fields` parameter, or the parameter
+    wasn't passed.
+    """
+    return fields is None or name in fields
+
+def only_fields(queryset, Serializer, fields, *, required=()):
+    """
+    Defers the columns of `queryset` which aren't serialized as one of
+    `fields` (or listed in `required`), if `fields` is passed.
+    """
+    if fields is None:
+        return queryset
+    columns = {field.name for field in queryset.model._meta.concrete_fields}
+    names = {*Serializer.source_names(fields), *required}
+    return queryset.only(*(columns & names))
+
+
+def course_serializer(reviews):
+    return CourseWithReviewsSerializer if reviews else CourseSerializer
+
+def courses_queryset(*, reviews, fields=None):
+    """
+    Recent courses, with everything `CourseSerializer` (or
+    `CourseWithReviewsSerializer` if `reviews` is passed) needs annotated or
+    prefetched, so serializing any number of courses costs a fixed number of
+    queries. If `fields` is passed, only what those fields need is fetched.
+    """
+    # the name is always needed, to look courses up by and page through them
+    courses = only_fields(CourseModel.recent.all(), course_serializer(reviews),
+        fields, required=["name"])
+    if wants(fields, "average_gpa"):
+        courses = courses.average_gpa_annotate()
+    if wants(fields, "professors"):
+        courses = courses.prefetch_related(
+            Prefetch("professors", queryset=ProfessorModel.verified.all())
+        )
+    if reviews and wants(fields, "reviews"):
+        reviews_queryset = (
+            ReviewModel.verified
+            .select_related("course", "professor")
+            .order_by("pk")
+        )
+        courses = courses.prefetch_related(
+            Prefetch("review_set", queryset=reviews_queryset)
+        )
+    return courses
+
+
+def course_tags(request):
+    name = param(request, "name")
+    tags = ["catalog", cache_tag("grade", "course", name)]
+    if param_bool(request, "reviews", default=False):
+        tags.append(cache_tag("review", "course", name))
+    return tags
+
 class Course(APIView):
+    @data_version_condition(course_tags)
     def get(self, request):
         name = param(request, "name")
         reviews = param_bool(request, "reviews", default=False)
-
-        course = CourseModel.recent.filter(name=name).first()
+        Serializer = course_serializer(reviews)
+        fields = param_fields(request, Serializer.field_names())
+
+        course = (
+            courses_queryset(reviews=reviews, fields=fields)
+            .filter(name=name)
+            .first()
+        )
         if not course:
             raise ValidationError("course not found")
 
-        Serializer = (CourseWithReviewsSerializer if reviews else
-            CourseSerializer)
-        serializer = Serializer(course)
+        serializer = Serializer(course, fields=fields)
         return Response(serializer.data)
 
 
-class Courses(ListAPIView):
+def batch_names(request):
+    return param_list(request, "names", max_length=MAX_BATCH_NAMES)
+
+def batch_response(names, objects, Serializer, fields):
+    """
+    A map of each of `names` to the serialized object of that name in
+    `objects`, or null if there isn't one. Names are matched
+    case-insensitively, as the database compares them.
+    """
+    found = {}
+    for obj in objects:
+        # names (of professors) aren't unique, so keep the first, like the
+        # single lookup endpoints
+        found.setdefault(obj.name.lower(), obj)
+    data = Serializer(list(found.values()), many=True, fields=fields).data
+    serialized = dict(zip(found, data))
+    return Response({name: serialized.get(name.lower()) for name in names})
+
+def course_batch_tags(request):
+    names = batch_names(request)
+    reviews = param_bool(request, "reviews", default=False)
+    tags = ["catalog"]
+    for name in names:
+        tags.append(cache_tag("grade", "course", name))
+        if reviews:
+            tags.append(cache_tag("review", "course", name))
+    return tags
+
+class CourseBatch(APIView):
+    @data_version_condition(course_batch_tags)
+    def get(self, request):
+        names = batch_names(request)
+        reviews = param_bool(request, "reviews", default=False)
+        Serializer = course_serializer(reviews)
+        fields = param_fields(request, Serializer.field_names())
+
+        courses = (
+            courses_queryset(reviews=reviews, fields=fields)
+            .filter(name__in=names)
+        )
+        return batch_response(names, courses, Serializer, fields)
+
+
+class SparseListAPIView(ListAPIView):
+    """
+    A `ListAPIView` which only serializes the fields in the `fields`
+    parameter, if passed. `get_queryset` must set `self.fields` (and should
+    only fetch what those fields need).
+    """
+    fields = None
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, fields=self.fields, **kwargs)
+
+
+class Courses(SparseListAPIView):
     serializer_class = CourseSerializer
+    pagination_class = KeysetPagination
+    cursor_field = "name"
 
     def get_queryset(self):
         request = self.request
         department = param(request, "department", default=None)
         reviews = param_bool(request, "reviews", default=False)
-        limit = param_int(request, "limit", default=100, min_=0, max_=100)
-        offset = param_int(request, "offset", default=0, min_=0)
 
         if department and len(department) != 4:
             raise ValidationError("department parameter must be 4 characters")
 
-        courses = CourseModel.recent.all()
+        self.serializer_class = course_serializer(reviews)
+        self.fields = param_fields(request,
+            self.serializer_class.field_names())
+
+        courses = courses_queryset(reviews=reviews, fields=self.fields)
         if department:
             courses = courses.filter(department=department)
 
-        if reviews:
-            self.serializer_class = CourseWithReviewsSerializer
-
-        courses = courses[offset:offset + limit]
         return courses
 
 
+def professor_serializer(reviews):
+    return ProfessorWithReviewsSerializer if reviews else ProfessorSerializer
+
+def professors_queryset(*, reviews, fields=None):
+    """
+    Verified professors, with everything `ProfessorSerializer` (or
+    `ProfessorWithReviewsSerializer` if `reviews` is passed) needs annotated or
+    prefetched, so serializing any number of professors costs a fixed number
+    of queries. If `fields` is passed, only what those fields need is fetched.
+    """
+    # the name is always needed, to look professors up by
+    professors = only_fields(ProfessorModel.verified.all(),
+        professor_serializer(reviews), fields, required=["name"])
+    if wants(fields, "average_rating"):
+        professors = professors.average_rating_annotate()
+    if wants(fields, "courses"):
+        professors = professors.prefetch_related(
+            Prefetch("course_set", queryset=CourseModel.unfiltered.all())
+        )
+    if reviews and wants(fields, "reviews"):
+        reviews_queryset = (
+            ReviewModel.verified
+            .select_related("course", "professor")
+            .order_by("pk")
+        )
+        professors = professors.prefetch_related(
+            Prefetch("review_set", queryset=reviews_queryset)
+        )
+    return professors
+
+
 class Professor(APIView):
     def get(self, request):
         name = param(request, "name")
         reviews = param_bool(request, "reviews", default=False)
-
-        professor = ProfessorModel.verified.filter(name=name).first()
+        Serializer = professor_serializer(reviews)
+        fields = param_fields(request, Serializer.field_names())
+
+        professor = (
+            professors_queryset(reviews=reviews, fields=fields)
+            .filter(name=name)
+            .first()
+        )
         if not professor:
             raise ValidationError("professor not found")
 
-        Serializer = (ProfessorWithReviewsSerializer if reviews else
-            ProfessorSerializer)
-        serializer = Serializer(professor)
+        serializer = Serializer(professor, fields=fields)
         return Response(serializer.data)
 
-class Professors(ListAPIView):
+class ProfessorBatch(APIView):
+    def get(self, request):
+        names = batch_names(request)
+        reviews = param_bool(request, "reviews", default=False)
+        Serializer = professor_serializer(reviews)
+        fields = param_fields(request, Serializer.field_names())
+
+        professors = (
+            professors_queryset(reviews=reviews, fields=fields)
+            .filter(name__in=names)
+            .order_by("pk")
+        )
+        return batch_response(names, professors, Serializer, fields)
+
+class Professors(SparseListAPIView):
     serializer_class = ProfessorSerializer
+    pagination_class = KeysetPagination
+    # professor names aren't unique
+    cursor_field = "pk"
 
     def get_queryset(self):
         request = self.request
         type_ = param(request, "type", default=None,
             options=["professor", "ta"])
         reviews = param_bool(request, "reviews", default=False)
-        limit = param_int(request, "limit", default=100, min_=0, max_=100)
-        offset = param_int(request, "offset", default=0, min_=0)
         # keep backwards compatability
         if type_ == "ta":
             type_ = "TA"
 
-        professors = ProfessorModel.verified.all()
+        self.serializer_class = professor_serializer(reviews)
+        self.fields = param_fields(request,
+            self.serializer_class.field_names())
+
+        professors = professors_queryset(reviews=reviews, fields=self.fields)
         if type_:
             professors = professors.filter(type=type_)
 
-        if reviews:
-            self.serializer_class = ProfessorWithReviewsSerializer
-
-        professors = professors[offset:offset + limit]
         return professors
 
+def grades_tags(request):
+    tags = ["catalog"]
+    course_name = param(request, "course", default=None)
+    professor_name = param(request, "professor", default=None)
+    if course_name:
+        tags.append(cache_tag("grade", "course", course_name))
+    if professor_name:
+        tags.append(cache_tag("grade", "professor", professor_name))
+    return tags
+
 class Grades(APIView):
+    @data_version_condition(grades_tags)
     def get(self, request):
         course_name = param(request, "course", default=None)
         professor_name = param(request, "professor", default=None)
-        semester = param(request, "semester", default=None)
-        section = param(request, "section", default=None)
+        fields = param_fields(request, GradeSerializer.field_names())
 
         if not course_name and not professor_name:
             raise ValidationError("parameters must include at least one of: "
                 "\"course\", \"professor\"")
 
         # we'll start with the full queryset and filter it down as filters get
-        # applied.
-        grades = GradeModel.recent.all()
+        # applied. Joining in the course and professor names could otherwise
+        # change the order rows come back in.
+        grades = GradeModel.recent.order_by("pk")
 
         if course_name:
             course = CourseModel.recent.filter(name=course_name).first()
@@ -134,18 +318,91 @@ class Grades(APIView):
                 raise ValidationError("professor not found")
             grades = grades.filter(professor=professor)
 
-        if semester:
-            try:
-                semester = Semester(semester)
-            except:
-                raise ValidationError(f"invalid semester `{semester}`")
-            grades = grades.filter(semester=semester)
-
-        if section:
-            grades = grades.filter(section=section)
-
-        serializer = GradeSerializer(grades, many=True)
-        return Response(serializer.data)
+        grades = filter_grades(request, grades)
+        return Response(GradeSerializer.values(grades, fields))
+
+def filter_grades(request, grades):
+    """
+    Filters `grades` by the `semester` and `section` parameters, if passed.
+    """
+    semester = param(request, "semester", default=None)
+    section = param(request, "section", default=None)
+
+    if semester:
+        try:
+            semester = Semester(semester)
+        except:
+            raise ValidationError(f"invalid semester `{semester}`")
+        grades = grades.filter(semester=semester)
+
+    if section:
+        grades = grades.filter(section=section)
+
+    return grades
+
+def grades_batch_tags(request):
+    (by, names) = grades_batch_names(request)
+    return ["catalog", *(cache_tag("grade", by, name) for name in names)]
+
+def grades_batch_names(request):
+    courses = param_list(request, "courses", default=None,
+        max_length=MAX_BATCH_NAMES)
+    professors = param_list(request, "professors", default=None,
+        max_length=MAX_BATCH_NAMES)
+    if bool(courses) == bool(professors):
+        raise ValidationError("parameters must include exactly one of: "
+            "\"courses\", \"professors\"")
+    if courses:
+        return ("course", courses)
+    return ("professor", professors)
+
+class GradesBatch(APIView):
+    @data_version_condition(grades_batch_tags)
+    def get(self, request):
+        (by, names) = grades_batch_names(request)
+        fields = param_fields(request, GradeSerializer.field_names())
+
+        if by == "course":
+            objects = CourseModel.recent.filter(name__in=names)
+        else:
+            objects = ProfessorModel.verified.filter(name__in=names)
+        # name -> pk, keeping the first of professors with the same name
+        pks = {}
+        for (pk, name) in objects.order_by("pk").values_list("pk", "name"):
+            pks.setdefault(name.lower(), pk)
+
+        grades = (
+            GradeModel.recent
+            .filter(**{f"{by}__in": pks.values()})
+            .order_by("pk")
+        )
+        grades = filter_grades(request, grades)
+
+        grouped = {pk: [] for pk in pks.values()}
+        for (pk, data) in GradeSerializer.values(grades, fields, key=by):
+            grouped[pk].append(data)
+
+        return Response({name: grouped.get(pks.get(name.lower()))
+            for name in names})
+
+
+class Departments(APIView):
+    def get(self, request):
+        fields = param_fields(request,
+            ["department", "average_gpa", "num_students"])
+
+        data = []
+        for (department, average_gpa, num_students) in queries.department_grades():
+            department_data = {
+                "department": department,
+                "average_gpa": average_gpa,
+                "num_students": num_students
+            }
+            if fields is not None:
+                department_data = {field: value for (field, value) in
+                    department_data.items() if field in fields}
+            data.append(department_data)
+        return Response(data)
 
 
 class Search(APIView):
@@ -153,9 +410,13 @@ class Search(APIView):
         query = param(request, "query")
         limit = param_int(request, "limit", default=30, min_=0, max_=100)
         offset = param_int(request, "offset", default=0, min_=0)
+        fuzzy = param_bool(request, "fuzzy", default=False)
+        fields = param_fields(request, SearchResultSerializer.field_names())
 
         results = queries.search(query, limit, offset=offset, professors=True,
-            courses=True)
+            courses=True, fuzzy=fuzzy)
+        total = queries.search_count(query, professors=True, courses=True,
+            fuzzy=fuzzy)
 
-        serializer = SearchResultSerializer(results, many=True)
-        return Response(serializer.data)
+        serializer = SearchResultSerializer(results, many=True, fields=fields)
+        return Response(serializer.data, headers={"X-Total-Count": total})
@@ -0,0 +1,157 @@
+"""
+An in-memory index of everything `Autocomplete` can suggest, so the
+suggestions shown on every keystroke don't query the database at all.
+
+Professors are indexed by their name and aliases, and courses by their name
+(code) and title. Like the `icontains` queries this replaces, a search matches
+anywhere in these, case-insensitively. Matches are ranked by how well they
+match: an exact match (eg a full course code) first, then matches at the start
+of a name, then anywhere else. Within each rank professors come before
+courses, as in `queries.search`.
+
+Each process builds its own index the first time it's needed (or at startup,
+see `planetterp/wsgi.py`). When the catalog changes, the process notices within
+a few seconds and rebuilds the index in the background, serving the old one in
+the meantime (see `TTLCache`).
+"""
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from home.models import Professor, ProfessorAlias, Course
+from home.utils import ttl_cache
+
+# how well a search matches, best first
+EXACT = 0
+PREFIX = 1
+INFIX = 2
+
+# substrings of up to this length get a posting list of everything containing
+# them. Longer searches scan the shortest posting list of their own n-grams.
+NGRAM_LENGTH = 3
+
+def autocomplete_index():
+    return _load_autocomplete_index()
+
+@ttl_cache(24 * 60 * 60, shared=False, tags=["catalog"])
+def _load_autocomplete_index():
+    return AutocompleteIndex.load()
+
+
+class AutocompleteIndex:
+    def __init__(self, professors, courses):
+        # `professors` and `courses` are lists of `(obj, keys)`, where `keys`
+        # are the strings `obj` can be found by.
+        self.professors = _Index(professors)
+        self.courses = _Index(courses)
+
+    @staticmethod
+    def load():
+        aliases = defaultdict(list)
+        for (professor_id, alias) in (
+            ProfessorAlias.objects
+            .values_list("professor_id", "alias")
+        ):
+            aliases[professor_id].append(alias)
+
+        professors = Professor.verified.only("name", "slug")
+        courses = Course.recent.only("name", "title")
+        return AutocompleteIndex(
+            [(p, [p.name, *aliases[p.pk]]) for p in professors],
+            [(c, [c.name, c.title]) for c in courses]
+        )
+
+    def __repr__(self):
+        return (f"<AutocompleteIndex of {len(self.professors.objects)} "
+            f"professors and {len(self.courses.objects)} courses>")
+
+    def search(self, search, num_results, *, professors=False, courses=False):
+        """
+        The best `num_results` professors and courses matching `search`.
+        """
+        search = search.lower()
+        results = []
+        # professors before courses if both are passed
+        if professors:
+            results += self.professors.search(search, num_results)
+        if courses:
+            results += self.courses.search(search, num_results)
+        # `sort` is stable, so this keeps professors first within each rank
+        results.sort(key=lambda result: result[0])
+        return [obj for (_rank, obj) in results[:num_results]]
+
+
+class _Index:
+    def __init__(self, items):
+        items = [(obj, [key.lower() for key in keys if key])
+            for (obj, keys) in items]
+        items.sort(key=lambda item: item[1][0] if item[1] else "")
+
+        # objects are referred to by their position in `objects`, which is
+        # also the order we return matches of the same rank in.
+        self.objects = [obj for (obj, _keys) in items]
+        self.keys = [keys for (_obj, keys) in items]
+        self.exact = defaultdict(list)
+        # every `(key, i)`, sorted, so the keys starting with a search are a
+        # contiguous range
+        self.sorted_keys = []
+        # n-gram -> the (increasing) `i` of every object containing it
+        self.postings = defaultdict(lambda: array("i"))
+
+        for (i, keys) in enumerate(self.keys):
+            ngrams = set()
+            for key in keys:
+                self.exact[key].append(i)
+                self.sorted_keys.append((key, i))
+                for length in range(1, NGRAM_LENGTH + 1):
+                    for start in range(len(key) - length + 1):
+                        ngrams.add(key[start:start + length])
+            for ngram in ngrams:
+                self.postings[ngram].append(i)
+
+        self.exact = dict(self.exact)
+        self.sorted_keys.sort()
+        self.postings = dict(self.postings)
+
+    def search(self, search, num_results):
+        """
+        Up to `num_results` `(rank, obj)` tuples matching `search` (which must
+        be lowercase), best first.
+        """
+        found = set()
+        results = []
+
+        def add(rank, i):
+            if i not in found:
+                found.add(i)
+                results.append((rank, self.objects[i]))
+            return len(results) >= num_results
+
+        for i in self.exact.get(search, []):
+            if add(EXACT, i):
+                return results
+
+        start = bisect_left(self.sorted_keys, (search, -1))
+        for j in range(start, len(self.sorted_keys)):
+            (key, i) = self.sorted_keys[j]
+            if not key.startswith(search):
+                break
+            if add(PREFIX, i):
+                return results
+
+        for i in self._candidates(search):
+            if i in found:
+                continue
+            if any(search in key for key in self.keys[i]):
+                if add(INFIX, i):
+                    return results
+        return results
+
+    def _candidates(self, search):
+        if len(search) <= NGRAM_LENGTH:
+            # every object in this posting list contains `search`, but it's
+            # cheap to check again.
+            return self.postings.get(search, [])
+        ngrams = [search[start:start + NGRAM_LENGTH]
+            for start in range(len(search) - NGRAM_LENGTH + 1)]
+        return min((self.postings.get(ngram, []) for ngram in ngrams), key=len)
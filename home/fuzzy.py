@@ -0,0 +1,321 @@
+"""
+Typo-tolerant search, for the optional fuzzy mode of `queries.search`, and
+the similar name lookup behind `Professor.find_similar`.
+
+Every word of every verified professor's name and of every recent course's
+code and title is put in a `BKTree`, which finds the words within a few edits
+of a search's words while only comparing against a small fraction of them. A
+professor or course matches if each word of the search is close to one of its
+words.
+"""
+import re
+from collections import defaultdict
+from threading import Lock
+
+from Levenshtein import distance as levenshtein
+from fuzzywuzzy import fuzz
+
+from home.models import Professor, Course
+from home.utils import ttl_cache
+
+def fuzzy_index():
+    return _load_fuzzy_index()
+
+@ttl_cache(24 * 60 * 60, shared=False, tags=["catalog"])
+def _load_fuzzy_index():
+    return FuzzyIndex.load()
+
+def similar_name_index():
+    """
+    A `SimilarNameIndex` of every verified professor.
+    """
+    return _load_similar_name_index()
+
+def update_similar_name_index(professor, name):
+    """
+    Updates `professor`'s name in this process's `similar_name_index`, if it
+    has loaded one. `name` is `None` if `professor` was deleted or isn't
+    verified.
+    """
+    index = _load_similar_name_index.cache.peek((), {})
+    if index is None:
+        return
+    if name is None:
+        index.remove(professor)
+    else:
+        index.add(professor, name)
+
+# not tagged "catalog", since rebuilding the whole index after every professor
+# save would cost more than the scans it saves. Instead, professor saves update
+# the index of the process which made them in place (see
+# `update_similar_name_index`), and other processes pick them up when their
+# index is reloaded.
+@ttl_cache(60 * 60, shared=False)
+def _load_similar_name_index():
+    return SimilarNameIndex.load()
+
+def words(string):
+    return re.findall("[a-z0-9]+", string.lower())
+
+def max_distance(word):
+    """
+    The most edits we allow between `word` and a word it matches. Short words
+    are too easily turned into other words to allow as many.
+    """
+    if len(word) <= 2:
+        return 0
+    if len(word) <= 7:
+        return 1
+    return 2
+
+
+class BKTree:
+    """
+    A BK-tree (Burkhard-Keller tree) of strings under the levenshtein
+    distance.
+
+    Every node's children are keyed by their distance to it. Since the distance
+    is a metric, a search for the words within `d` of a word `w` only has to
+    visit the children of a node `n` at distances between
+    `distance(w, n) - d` and `distance(w, n) + d`, which prunes most of the
+    tree for small `d`.
+    """
+    def __init__(self, words=(), distance=levenshtein):
+        self.distance = distance
+        # a node is a `(word, {distance: child node})` tuple
+        self.root = None
+        self.size = 0
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, word):
+        if self.root is None:
+            self.root = (word, {})
+            self.size += 1
+            return
+
+        node = self.root
+        while True:
+            (node_word, children) = node
+            distance = self.distance(word, node_word)
+            if distance == 0:
+                return
+            if distance not in children:
+                children[distance] = (word, {})
+                self.size += 1
+                return
+            node = children[distance]
+
+    def search(self, word, max_distance):
+        """
+        Every `(distance, word)` in the tree within `max_distance` of `word`,
+        closest first.
+        """
+        results = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            (node_word, children) = stack.pop()
+            distance = self.distance(word, node_word)
+            if distance <= max_distance:
+                results.append((distance, node_word))
+            for (child_distance, child) in children.items():
+                if abs(child_distance - distance) <= max_distance:
+                    stack.append(child)
+        results.sort()
+        return results
+
+
+class FuzzyIndex:
+    def __init__(self, professors, courses):
+        # `professors` and `courses` are lists of `(obj, strings)`, where
+        # `obj` is found by the words of `strings`.
+        self.objects = []
+        # word -> the positions in `objects` of everything with that word
+        self.postings = defaultdict(set)
+        for (obj, strings) in [*professors, *courses]:
+            i = len(self.objects)
+            self.objects.append(obj)
+            for string in strings:
+                for word in words(string or ""):
+                    self.postings[word].add(i)
+        self.postings = dict(self.postings)
+        self.tree = BKTree(sorted(self.postings))
+
+    @staticmethod
+    def load():
+        professors = Professor.verified.only("name", "slug").order_by("name")
+        courses = Course.recent.only("name", "title").order_by("name")
+        return FuzzyIndex(
+            [(p, [p.name]) for p in professors],
+            [(c, [c.name, c.title]) for c in courses]
+        )
+
+    def __repr__(self):
+        return (f"<FuzzyIndex of {len(self.objects)} objects and "
+            f"{len(self.tree)} words>")
+
+    def search(self, search, *, professors=False, courses=False):
+        """
+        The professors and courses where every word of `search` is close to
+        one of their words, ordered by the total number of edits, then
+        professors before courses, then by name.
+        """
+        # i -> total distance of the words matched so far
+        distances = None
+        for word in words(search):
+            word_distances = {}
+            for (distance, match) in self.tree.search(word, max_distance(word)):
+                for i in self.postings[match]:
+                    if i not in word_distances:
+                        word_distances[i] = distance
+            if distances is None:
+                distances = word_distances
+            else:
+                distances = {i: distances[i] + distance
+                    for (i, distance) in word_distances.items()
+                    if i in distances}
+
+        results = []
+        for (i, distance) in (distances or {}).items():
+            obj = self.objects[i]
+            is_course = isinstance(obj, Course)
+            if (is_course and not courses) or (not is_course and not professors):
+                continue
+            # `objects` is already ordered by type, then name
+            results.append((distance, i))
+        results.sort()
+        return [self.objects[i] for (_distance, i) in results]
+
+
+class SimilarNameIndex:
+    """
+    Finds the names whose `fuzz.ratio` with a name is above a tolerance,
+    without scoring every name.
+
+    Candidates are narrowed down in two steps before scoring them, neither of
+    which can miss a name. First, the ratio is at most
+    `2 * min(len) / (len + len)`, so names too much longer or shorter than the
+    name are skipped. Second, `fuzz.ratio` is `1 - edits / (len + len)`, where
+    a substitution counts as two edits, so a ratio above the tolerance bounds
+    the number of edits between the names. Every edit changes at most three
+    trigrams, so if the longer name has more than three times that many
+    (padded) trigrams, the names must share one, and we only look at the names
+    sharing a trigram with the name. For the lengths where that doesn't hold
+    (most of them, for low tolerances), we look at every name of that length.
+    """
+    def __init__(self, items=()):
+        # `items` are `(obj, name)` tuples
+        self.objects = []
+        self.names = []
+        # obj -> its position in `objects`. Removing an object leaves `None`
+        # in its place in `objects` and `names`, so positions never change.
+        self.positions = {}
+        # trigram -> the (increasing) positions in `objects` of every name
+        # with that trigram
+        self.postings = defaultdict(list)
+        # name length -> the (increasing) positions of every name that long
+        self.lengths = defaultdict(list)
+        # the index is updated in place, possibly while another thread is
+        # searching it
+        self.lock = Lock()
+        for (obj, name) in items:
+            self.add(obj, name)
+
+    @staticmethod
+    def load():
+        return SimilarNameIndex((p, p.name) for p in Professor.verified.all())
+
+    def __repr__(self):
+        return f"<SimilarNameIndex of {len(self.positions)} names>"
+
+    def add(self, obj, name):
+        """
+        Adds `obj` with `name`, replacing its old name if it was already added.
+        """
+        with self.lock:
+            self._remove(obj)
+            i = len(self.objects)
+            self.positions[obj] = i
+            self.objects.append(obj)
+            self.names.append(name)
+            for trigram in self.trigrams(name):
+                self.postings[trigram].append(i)
+            self.lengths[len(name)].append(i)
+
+    def remove(self, obj):
+        with self.lock:
+            self._remove(obj)
+
+    def _remove(self, obj):
+        # its postings are skipped by `_find` instead of searched for
+        i = self.positions.pop(obj, None)
+        if i is not None:
+            self.objects[i] = None
+            self.names[i] = None
+
+    @staticmethod
+    def trigrams(name):
+        # pad the name so even one character names have a trigram.
+        name = f" {name.lower()} "
+        return {name[i:i + 3] for i in range(len(name) - 2)}
+
+    def find(self, name, tolerance):
+        """
+        Every object whose name has a `fuzz.ratio` above `tolerance` with
+        `name`, most similar first.
+        """
+        with self.lock:
+            return [self.objects[i] for i in self._find(name, tolerance)]
+
+    def _find(self, name, tolerance):
+        # the lengths of the names which could be similar enough to `name`,
+        # split by whether they'd have to share a trigram with it
+        (trigram_lengths, scan_lengths) = (set(), [])
+        for length in self.lengths:
+            if not self.may_match(len(name), length, tolerance):
+                continue
+            if max(len(name), length) > 3 * self.max_edits(len(name), length,
+                tolerance):
+                trigram_lengths.add(length)
+            else:
+                scan_lengths.append(length)
+
+        candidates = set()
+        for length in scan_lengths:
+            candidates.update(self.lengths[length])
+        if trigram_lengths:
+            for trigram in self.trigrams(name):
+                candidates.update(i for i in self.postings.get(trigram, [])
+                    if self.names[i] is not None and
+                    len(self.names[i]) in trigram_lengths)
+
+        similar = []
+        # in order of insertion, so equally similar names keep that order
+        for i in sorted(candidates):
+            other = self.names[i]
+            if other is None:
+                continue
+            ratio = fuzz.ratio(name, other)
+            if ratio > tolerance:
+                similar.append((ratio, i))
+
+        similar.sort(key=lambda item: item[0], reverse=True)
+        return [i for (_ratio, i) in similar]
+
+    @staticmethod
+    def may_match(length, other_length, tolerance):
+        # whether the most `fuzz.ratio` could be for names of these lengths is
+        # above `tolerance`
+        lengths = length + other_length
+        shortest = min(length, other_length)
+        return not lengths or round(200 * shortest / lengths) > tolerance
+
+    @staticmethod
+    def max_edits(length, other_length, tolerance):
+        # the most edits between names of these lengths with a `fuzz.ratio`
+        # above `tolerance`. The ratio is rounded, so it's above the tolerance
+        # only if `100 * (1 - edits / lengths) >= tolerance + 0.5`.
+        return (length + other_length) * (199 - 2 * tolerance) // 200
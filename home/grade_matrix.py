@@ -0,0 +1,221 @@
+"""
+An optional in-memory copy of the grade table, for the analytics queries (grade
+charts, tools) which sum the same few integer columns of `Grade` over and over.
+
+The entire table is loaded once into a column-oriented numpy structure: an
+integer matrix of the 15 grade columns, plus index vectors for course,
+professor, semester, department, and section. Filters become vectorized masks
+and group-bys become `np.add.reduceat` over the sorted group codes, so most
+tool requests don't query the database at all.
+
+This is disabled unless numpy is installed and `GRADE_MATRIX` is set in
+`config.py`. Every caller must fall back to the equivalent orm query when
+`grade_matrix()` returns `None`. Results are returned in the same shape as
+`GradeQuerySet.grade_data_by`, and match the orm's exactly. That includes
+average gpas: the orm's fractional weights are sent to the database as floating
+point literals, so both SQLite and MySQL compute them in double precision, and
+we do the same operations in the same order.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from home.models import Grade, Professor, Course
+from home.utils import ttl_cache, Semester, pf_semesters
+from planetterp import config
+
+# `Grade.recent` without the orm
+RECENT_SEMESTER = Semester(201201).number()
+
+def grade_matrix():
+    """
+    Returns the current `GradeMatrix`, or `None` if the grade matrix is
+    disabled.
+    """
+    if np is None or not getattr(config, "GRADE_MATRIX", False):
+        return None
+    return _load_grade_matrix()
+
+# loading the matrix takes a few seconds, so reuse the ttl cache's behavior of
+# rebuilding it in the background and serving the old matrix in the meantime,
+# both when it expires and when grades or the catalog change (see `TTLCache`).
+# `recompute_ttl_cache` will also reload it. Each process keeps its own copy,
+# since unpickling the matrix from a shared cache on every call would defeat the
+# point.
+@ttl_cache(24 * 60 * 60, shared=False, tags=["catalog", "grade"])
+def _load_grade_matrix():
+    return GradeMatrix.load()
+
+
+class GradeMatrix:
+    def __init__(self, rows, course_names, recent_courses, professor_slugs):
+        # rows is a list of `(course_id, professor_id, semester, section,
+        # department, num_students, *grades)` tuples.
+        (course_ids, professor_ids, semesters, sections, departments,
+            num_students, *grades) = zip(*rows) if rows else [()] * 21
+
+        # code every course by its rank in alphabetical order, so grouping by
+        # course code also orders by course name, like the orm does.
+        self.course_names = sorted(set(course_names[id_] for id_ in course_ids))
+        course_codes = {name: i for i, name in enumerate(self.course_names)}
+        self.course_codes = _upper_keys(course_codes)
+        self.course = np.array([course_codes[course_names[id_]]
+            for id_ in course_ids], dtype=np.int32)
+        self.recent_courses = {name.upper() for name in recent_courses}
+
+        # professors are stored by id, with -1 for grades without a professor.
+        self.professor = np.array([-1 if id_ is None else id_
+            for id_ in professor_ids], dtype=np.int64)
+        self.professor_slugs = _upper_keys(professor_slugs)
+
+        self.semester = np.array([s.number() for s in semesters],
+            dtype=np.int32)
+
+        (self.department_names, department) = np.unique(
+            np.array(departments, dtype=str), return_inverse=True)
+        self.department_names = [str(d) for d in self.department_names]
+        self.department = department.astype(np.int32)
+        self.department_codes = _upper_keys({name: i for i, name in
+            enumerate(self.department_names)})
+
+        (section_names, section) = np.unique(np.array(sections, dtype=str),
+            return_inverse=True)
+        self.section = section.astype(np.int32)
+        self.section_codes = {str(name): i for i, name in
+            enumerate(section_names)}
+
+        self.num_students = np.array(num_students, dtype=np.int64)
+        self.grades = np.array(grades, dtype=np.int64).T
+
+    @staticmethod
+    def load():
+        rows = (
+            Grade.unfiltered
+            .values_list("course_id", "professor_id", "semester", "section",
+                "course__department", "num_students", *Grade.GRADE_FIELDS)
+            .iterator()
+        )
+        course_names = dict(Course.unfiltered.values_list("id", "name"))
+        recent_courses = set(Course.recent.values_list("name", flat=True))
+        professor_slugs = dict(Professor.verified.values_list("slug", "id"))
+        return GradeMatrix(list(rows), course_names, recent_courses,
+            professor_slugs)
+
+    def __repr__(self):
+        return f"<GradeMatrix of {len(self.num_students)} grades>"
+
+    def has_recent_course(self, name):
+        return name.upper() in self.recent_courses
+
+    def mask(self, *, recent=False, exclude_pf=False, course=None,
+        course_contains=None, department=None, professor=None, semester=None,
+        section=None):
+        """
+        The rows matching every passed filter, as a boolean array.
+
+        The course, department, and professor (by slug) filters are
+        case-insensitive to match our database's collation.
+        """
+        mask = np.ones(len(self.num_students), dtype=bool)
+        if recent:
+            mask &= self.semester >= RECENT_SEMESTER
+        if exclude_pf:
+            mask &= ~np.isin(self.semester, [s.number() for s in pf_semesters()])
+        if course is not None:
+            mask &= self.course == self.course_codes.get(course.upper(), -1)
+        if course_contains is not None:
+            codes = [i for i, name in enumerate(self.course_names)
+                if course_contains.upper() in name.upper()]
+            mask &= np.isin(self.course, codes)
+        if department is not None:
+            code = self.department_codes.get(department.upper(), -1)
+            mask &= self.department == code
+        if professor is not None:
+            # as with the orm, an unknown professor matches grades without a
+            # professor.
+            mask &= self.professor == self.professor_slugs.get(
+                professor.upper(), -1)
+        if semester is not None:
+            mask &= self.semester == semester.number()
+        if section is not None:
+            mask &= self.section == self.section_codes.get(section, -1)
+        return mask
+
+    def aggregate(self, **filters):
+        """
+        The equivalent of `average_gpa`, `num_students`, and
+        `grade_totals_aggregate` on the grades matching `filters` (see `mask`).
+        Returns a dict with the keys "average_gpa", "num_students", and the
+        keys of `grade_totals_aggregate`.
+        """
+        mask = self.mask(**filters)
+        if not mask.any():
+            data = {f"{field}_total": None for field in Grade.GRADE_FIELDS}
+            return {"average_gpa": None, "num_students": None, **data}
+
+        grades = self.grades[mask].sum(axis=0)
+        num_students = self.num_students[mask].sum()
+        return _grade_data(grades, num_students)
+
+    def grade_data_by(self, field, **filters):
+        """
+        The equivalent of `GradeQuerySet.grade_data_by(field)` on the grades
+        matching `filters` (see `mask`). `field` must be one of "course__name",
+        "course__department", or "semester".
+        """
+        if field == "course__name":
+            (codes, labels) = (self.course, self.course_names)
+        elif field == "course__department":
+            (codes, labels) = (self.department, self.department_names)
+        elif field == "semester":
+            (codes, labels) = (self.semester, None)
+        else:
+            raise ValueError(f"cannot group grades by {field}")
+
+        mask = self.mask(**filters)
+        codes = codes[mask]
+        if not len(codes):
+            return []
+
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        grades = np.add.reduceat(self.grades[mask][order], starts, axis=0)
+        num_students = np.add.reduceat(self.num_students[mask][order], starts)
+
+        data = []
+        for i, start in enumerate(starts):
+            code = int(codes[start])
+            value = Semester(code) if labels is None else labels[code]
+            data.append({
+                field: value,
+                **_grade_data(grades[i], num_students[i])
+            })
+        return data
+
+
+def _upper_keys(d):
+    return {key.upper(): value for key, value in d.items() if key is not None}
+
+# the weights of `GradeQuerySet._apply_average_gpa`, in the same order so the
+# floating point operations match.
+GPA_WEIGHTS = [4, 4, 3.7, 3.3, 3, 2.7, 2.3, 2, 1.7, 1.3, 1, 0.7]
+
+def _grade_data(grades, num_students):
+    grades = [int(total) for total in grades]
+    numerator = 0
+    for (weight, total) in zip(GPA_WEIGHTS, grades):
+        numerator = numerator + total * weight
+    # every grade except "other" counts towards the gpa
+    denominator = sum(grades[:-1])
+    average_gpa = None if denominator == 0 else numerator / denominator
+
+    data = {
+        f"{field}_total": total for field, total in zip(Grade.GRADE_FIELDS, grades)
+    }
+    return {
+        "average_gpa": average_gpa,
+        "num_students": int(num_students),
+        **data
+    }
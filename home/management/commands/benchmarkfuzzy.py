@@ -0,0 +1,119 @@
+import random
+import string
+import time
+
+from django.core.management import BaseCommand
+
+from fuzzywuzzy import fuzz
+
+from home.fuzzy import BKTree, SimilarNameIndex, levenshtein, max_distance
+
+CONSONANTS = "bcdfghjklmnprstvwz"
+VOWELS = "aeiou"
+
+class Command(BaseCommand):
+    help = ("Benchmarks the BK-tree behind fuzzy search (or with --similar, "
+        "the `SimilarNameIndex` behind `Professor.find_similar`) against a "
+        "linear scan, on randomly generated professor names of increasing "
+        "size. Doesn't touch the database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("-s", "--sizes", type=int, nargs="+",
+            default=[1_000, 4_000, 16_000, 64_000], help="the numbers of "
+            "names to benchmark with.")
+        parser.add_argument("-q", "--queries", type=int, default=200,
+            help="the number of searches to time at each size. Defaults to "
+            "200.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--similar", action="store_true", help="benchmark "
+            "`SimilarNameIndex.find` against `fuzz.ratio` on every name "
+            "instead.")
+        parser.add_argument("-t", "--tolerance", type=int, default=70,
+            help="the tolerance of the similar name searches. Defaults to 70, "
+            "as in the admin panel.")
+
+    def handle(self, *args, **options):
+        rand = random.Random(options["seed"])
+        if options["similar"]:
+            self.similar_names(rand, options)
+            return
+
+        self.stdout.write(f"{'names':>8} {'words':>8} {'compared':>9} "
+            f"{'tree':>10} {'scan':>10}")
+        for size in options["sizes"]:
+            names = [self.name(rand) for _ in range(size)]
+            words = sorted({word for name in names for word in name.split()})
+
+            comparisons = 0
+            def distance(a, b):
+                nonlocal comparisons
+                comparisons += 1
+                return levenshtein(a, b)
+            tree = BKTree(words, distance=distance)
+
+            # misspell real words, as a user would
+            queries = [self.typo(rand, rand.choice(words))
+                for _ in range(options["queries"])]
+
+            comparisons = 0
+            start = time.perf_counter()
+            for query in queries:
+                tree.search(query, max_distance(query))
+            tree_time = (time.perf_counter() - start) / len(queries)
+            compared = comparisons / len(queries) / len(words)
+
+            start = time.perf_counter()
+            for query in queries:
+                [word for word in words
+                    if levenshtein(query, word) <= max_distance(query)]
+            scan_time = (time.perf_counter() - start) / len(queries)
+
+            self.stdout.write(f"{size:>8} {len(words):>8} {compared:>9.1%} "
+                f"{tree_time * 1e6:>8.0f}us {scan_time * 1e6:>8.0f}us")
+
+    def similar_names(self, rand, options):
+        tolerance = options["tolerance"]
+        self.stdout.write(f"{'names':>8} {'index':>10} {'scan':>10} "
+            f"{'missed':>7}")
+        for size in options["sizes"]:
+            names = [self.name(rand) for _ in range(size)]
+            index = SimilarNameIndex((name, name) for name in names)
+
+            # misspell a word of real names, as a duplicate professor would be
+            queries = []
+            for _ in range(options["queries"]):
+                words = rand.choice(names).split()
+                i = rand.randrange(len(words))
+                words[i] = self.typo(rand, words[i])
+                queries.append(" ".join(words))
+
+            start = time.perf_counter()
+            found = [index.find(query, tolerance) for query in queries]
+            index_time = (time.perf_counter() - start) / len(queries)
+
+            start = time.perf_counter()
+            expected = [[name for name in names
+                if fuzz.ratio(query, name) > tolerance] for query in queries]
+            scan_time = (time.perf_counter() - start) / len(queries)
+
+            # should always be 0, since the index's filters are exact
+            missed = sum(len(set(names_) - set(found_))
+                for (names_, found_) in zip(expected, found))
+            self.stdout.write(f"{size:>8} {index_time * 1e6:>8.0f}us "
+                f"{scan_time * 1e6:>8.0f}us {missed:>7}")
+
+    @staticmethod
+    def name(rand):
+        # pronounceable words, which are closer to each other (and so harder
+        # to tell apart) than random letters, like real names
+        def word():
+            syllables = rand.randint(1, 4)
+            return "".join(rand.choice(CONSONANTS) + rand.choice(VOWELS)
+                for _ in range(syllables)) + rand.choice(["", *CONSONANTS])
+        return f"{word()} {word()}"
+
+    @staticmethod
+    def typo(rand, word):
+        i = rand.randrange(len(word))
+        letter = rand.choice(string.ascii_lowercase)
+        return word[:i] + letter + word[i + 1:]
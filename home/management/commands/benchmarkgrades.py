@@ -0,0 +1,67 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Count
+
+from rest_framework.renderers import JSONRenderer
+
+from home.models import Course, Grade
+from api.serializers import GradeSerializer
+
+class Command(BaseCommand):
+    help = ("Benchmarks `GradeSerializer.values` (the grades api) against "
+        "`GradeSerializer`, on the grades of the courses with the most "
+        "sections, and checks that both return the same bytes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("courses", nargs="*", help="the courses to "
+            "benchmark with. Defaults to the five with the most grades.")
+        parser.add_argument("-r", "--repeat", type=int, default=5,
+            help="the number of times to time each course. Defaults to 5.")
+
+    def handle(self, *args, **options):
+        names = options["courses"]
+        if not names:
+            names = (
+                Course.recent
+                .annotate(num_grades=Count("grade"))
+                .order_by("-num_grades")
+                .values_list("name", flat=True)[:5]
+            )
+
+        renderer = JSONRenderer()
+        self.stdout.write(f"{'course':>10} {'grades':>7} {'serializer':>12} "
+            f"{'values':>10} {'speedup':>8}")
+        for name in names:
+            course = Course.recent.filter(name=name).first()
+            if not course:
+                raise CommandError(f"course {name} not found")
+            # the same queryset as the grades api
+            grades = Grade.recent.filter(course=course).order_by("pk")
+
+            def serializer():
+                # joined in, so we only time the serializer, not a query for
+                # each grade's course and professor
+                queryset = grades.select_related("course", "professor")
+                return GradeSerializer(queryset, many=True).data
+            def values():
+                return GradeSerializer.values(grades.all())
+
+            if renderer.render(serializer()) != renderer.render(values()):
+                raise CommandError(f"output for {name} differs")
+
+            serializer_time = self.time(serializer, options["repeat"])
+            values_time = self.time(values, options["repeat"])
+            self.stdout.write(f"{name:>10} {grades.count():>7} "
+                f"{serializer_time * 1e3:>10.1f}ms {values_time * 1e3:>8.1f}ms "
+                f"{serializer_time / values_time:>7.1f}x")
+
+    @staticmethod
+    def time(f, repeat):
+        # the best of `repeat` runs, which is the least affected by noise
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            f()
+            times.append(time.perf_counter() - start)
+        return min(times)
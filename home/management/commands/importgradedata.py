@@ -19,7 +19,8 @@ from requests import get
 
 from django.core.management import BaseCommand, CommandError
 
-from home.models import Professor, Course, Grade, ProfessorAlias
+from home.models import (Professor, Course, Grade, ProfessorAlias,
+    update_grade_rollups, invalidate_caches)
 from home.utils import Semester
 
 class ValidationError(Exception):
@@ -58,6 +59,12 @@ class Command(BaseCommand):
         grades = Grade.unfiltered.bulk_create(self.grades)
         self.stdout.write(f"Done, added {len(grades)} grades")
 
+        self.stdout.write(f"Updating grade rollups for {self.semester.name()}...")
+        update_grade_rollups(semesters=[self.semester])
+        invalidate_caches("grade",
+            courses=[grade.course_id for grade in grades],
+            professors=[grade.professor_id for grade in grades])
+
         if self.reject_rows:
             self.stdout.write(f"Exporting {len(self.reject_rows)} rejected rows...")
             with open("rejected_imports.csv", "w+") as f:
@@ -5,7 +5,8 @@ from datetime import datetime
 from django.core.management import BaseCommand
 from argparse import RawTextHelpFormatter
 
-from home.models import Course, Professor, ProfessorCourse, ProfessorAlias
+from home.models import (Course, Professor, ProfessorCourse, ProfessorAlias,
+    batch_invalidations)
 from home.utils import Semester, create_autoslug
 
 class Command(BaseCommand):
@@ -44,6 +45,18 @@ class Command(BaseCommand):
         semesters = [Semester(s) for s in options['semesters']]
         print(f"Inputted Semesters: {', '.join(s.name() for s in semesters)}")
 
+        # invalidate the catalog's caches once we're done, not after every
+        # course and professor we add.
+        with batch_invalidations():
+            self._update(semesters)
+
+        print(f"\n** New Courses Created: {self.total_num_new_courses} **")
+        print(f"** New Professors Created: {self.total_num_new_professors} **")
+
+        runtime = datetime.now() - t_start
+        print(f"Runtime: {round(runtime.seconds / 60, 2)} minutes")
+
+    def _update(self, semesters):
         for semester in semesters:
             kwargs = {"semester": semester, "per_page": 100, "page": 1}
             course_data = requests.get("https://api.umd.io/v1/courses", params=kwargs).json()
@@ -81,12 +94,6 @@ class Command(BaseCommand):
                 kwargs["page"] += 1
                 course_data = requests.get("https://api.umd.io/v1/courses", params=kwargs).json()
 
-        print(f"\n** New Courses Created: {self.total_num_new_courses} **")
-        print(f"** New Professors Created: {self.total_num_new_professors} **")
-
-        runtime = datetime.now() - t_start
-        print(f"Runtime: {round(runtime.seconds / 60, 2)} minutes")
-
     def _professors(self, course: Course, semester: Semester):
         kwargs = {"course_id": course.name}
         umdio_professors = requests.get("https://api.umd.io/v1/professors", params=kwargs).json()
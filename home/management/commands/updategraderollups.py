@@ -0,0 +1,23 @@
+from django.core.management import BaseCommand
+
+from home.models import update_grade_rollups
+from home.utils import Semester
+
+class Command(BaseCommand):
+    help = ("Rebuilds the grade rollup tables from the raw grade data. Only "
+        "necessary if grades were modified outside of importgradedata or the "
+        "admin panel.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("-s", "--semester", action="append",
+            help="only rebuild rollups for this semester. Can be passed "
+            "multiple times.")
+
+    def handle(self, *args, **options):
+        semesters = None
+        if options["semester"]:
+            semesters = [Semester(s) for s in options["semester"]]
+
+        print("updating grade rollups")
+        update_grade_rollups(semesters=semesters)
+        print("finished updating grade rollups")
@@ -1,7 +1,7 @@
 from django.core.management import BaseCommand
 from django.db.models import Max, Q
 
-from home.models import Course
+from home.models import Course, invalidate_tags
 from home.utils import Semester
 
 class Command(BaseCommand):
@@ -45,4 +45,6 @@ class Command(BaseCommand):
             )
             .update(is_recent=True)
         )
+        # `update` doesn't send the signals which would do this for us
+        invalidate_tags("catalog")
         print("finished updating recency")
@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from home import queries
+from home.models import Course, Professor
+from home.utils import shared_ttl_cache
+from home.views.basic import Index
+from home.views.data_sources import GradeData, CourseDifficultyData
+from home.views.tools import ToolStatistics
+
+class Command(BaseCommand):
+    help = ("Precomputes the cached grade charts of recent courses and "
+        "verified professors, and the cached data of the tools, so the first "
+        "visitors after a deploy or a cache recomputation don't have to wait "
+        "for them. Requires TTL_CACHE_BACKEND, as the results are otherwise "
+        "only cached in this process.")
+
+    ITEM_TYPES = ["tools", "courses", "professors"]
+
+    def add_arguments(self, parser):
+        parser.add_argument("-w", "--workers", type=int, default=4,
+            help="the number of items to compute in parallel. Defaults to 4.")
+        parser.add_argument("-t", "--type", action="append",
+            choices=self.ITEM_TYPES, help="only warm items of this type. Can "
+            "be passed multiple times. Defaults to every type.")
+
+    def handle(self, *args, **options):
+        if shared_ttl_cache() is None:
+            raise CommandError("The ttl caches are not shared between "
+                "processes, so there is nothing to warm from here. Set "
+                "TTL_CACHE_BACKEND in config.py.")
+
+        types = options["type"] or self.ITEM_TYPES
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for type_ in types:
+                items = getattr(self, f"{type_}_items")()
+                self.stdout.write(f"Warming {len(items)} {type_}...")
+
+                start = time.perf_counter()
+                computed = sum(executor.map(lambda item: item(), items))
+                elapsed = time.perf_counter() - start
+
+                self.stdout.write(f"Done, computed {computed} {type_} in "
+                    f"{elapsed:.2f}s ({len(items) - computed} were already "
+                    "up to date)")
+
+    # Each item is a function which warms one cached result, and returns
+    # whether it had to be computed. The arguments must match the ones the
+    # views are called with exactly, or we'll warm a different cache entry.
+
+    def tools_items(self):
+        def departments_data():
+            # warm the department grades first, or `_departments_data` would
+            # be computed from the out of date ones.
+            queries.department_grades.warm()
+            return CourseDifficultyData._departments_data.warm()
+
+        return [
+            CourseDifficultyData._course_data.warm,
+            departments_data,
+            ToolStatistics.graph_data.warm,
+            Index.get_counts.warm,
+            # the grade graph on the home page
+            partial(GradeData._grade_data.warm, "", "", None, None, False)
+        ]
+
+    def courses_items(self):
+        names = Course.recent.order_by("name").values_list("name", flat=True)
+        return [
+            partial(GradeData._grade_data.warm, "", name, None, None, False)
+            for name in names
+        ]
+
+    def professors_items(self):
+        def professor(slug, name):
+            computed = [
+                GradeData._grade_data.warm(slug, "", None, None, False),
+                # the professor's courses, on the grades page
+                GradeData._course_grade_data.warm(name, False)
+            ]
+            return any(computed)
+
+        professors = Professor.verified.order_by("slug").values_list("slug",
+            "name")
+        return [partial(professor, slug, name) for (slug, name) in professors]
@@ -0,0 +1,195 @@
+# Generated by Django 3.2.4 on 2026-10-18 20:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import home.models
+
+GRADE_FIELDS = ["num_students", "a_plus", "a", "a_minus", "b_plus", "b",
+    "b_minus", "c_plus", "c", "c_minus", "d_plus", "d", "d_minus", "f", "w",
+    "other"]
+
+# populate the new rollup tables from the existing grade data. This duplicates
+# `GradeRollup.rebuild`, as migrations can't call methods on the live models.
+def populate_rollups(apps, _schema_editor):
+    Grade = apps.get_model("home", "Grade")
+    rollups = [
+        ("CourseGradeRollup", {"course_id": "course"}),
+        ("ProfessorGradeRollup", {"professor_id": "professor"}),
+        ("CourseProfessorGradeRollup",
+            {"course_id": "course", "professor_id": "professor"}),
+        ("DepartmentGradeRollup", {"department": "course__department"})
+    ]
+
+    for (model_name, group_by) in rollups:
+        Rollup = apps.get_model("home", model_name)
+        values = (
+            Grade._default_manager
+            .values(*group_by.values(), "semester")
+            .order_by()
+            .annotate(**{
+                f"{field}_total": models.Sum(field) for field in GRADE_FIELDS
+            })
+        )
+
+        new_rollups = []
+        for value in values:
+            kwargs = {
+                rollup_field: value[grade_field]
+                for rollup_field, grade_field in group_by.items()
+            }
+            for field in GRADE_FIELDS:
+                kwargs[field] = value[f"{field}_total"]
+            new_rollups.append(Rollup(semester=value["semester"], **kwargs))
+        Rollup._default_manager.bulk_create(new_rollups, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0011_user_is_planetterp_admin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseGradeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', home.models.SemesterField()),
+                ('num_students', models.PositiveIntegerField()),
+                ('a_plus', models.PositiveIntegerField()),
+                ('a', models.PositiveIntegerField()),
+                ('a_minus', models.PositiveIntegerField()),
+                ('b_plus', models.PositiveIntegerField()),
+                ('b', models.PositiveIntegerField()),
+                ('b_minus', models.PositiveIntegerField()),
+                ('c_plus', models.PositiveIntegerField()),
+                ('c', models.PositiveIntegerField()),
+                ('c_minus', models.PositiveIntegerField()),
+                ('d_plus', models.PositiveIntegerField()),
+                ('d', models.PositiveIntegerField()),
+                ('d_minus', models.PositiveIntegerField()),
+                ('f', models.PositiveIntegerField()),
+                ('w', models.PositiveIntegerField()),
+                ('other', models.PositiveIntegerField()),
+            ],
+            options={
+                'db_table': 'home_grade_rollup_course',
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseProfessorGradeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', home.models.SemesterField()),
+                ('num_students', models.PositiveIntegerField()),
+                ('a_plus', models.PositiveIntegerField()),
+                ('a', models.PositiveIntegerField()),
+                ('a_minus', models.PositiveIntegerField()),
+                ('b_plus', models.PositiveIntegerField()),
+                ('b', models.PositiveIntegerField()),
+                ('b_minus', models.PositiveIntegerField()),
+                ('c_plus', models.PositiveIntegerField()),
+                ('c', models.PositiveIntegerField()),
+                ('c_minus', models.PositiveIntegerField()),
+                ('d_plus', models.PositiveIntegerField()),
+                ('d', models.PositiveIntegerField()),
+                ('d_minus', models.PositiveIntegerField()),
+                ('f', models.PositiveIntegerField()),
+                ('w', models.PositiveIntegerField()),
+                ('other', models.PositiveIntegerField()),
+            ],
+            options={
+                'db_table': 'home_grade_rollup_course_professor',
+            },
+        ),
+        migrations.CreateModel(
+            name='DepartmentGradeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', home.models.SemesterField()),
+                ('num_students', models.PositiveIntegerField()),
+                ('a_plus', models.PositiveIntegerField()),
+                ('a', models.PositiveIntegerField()),
+                ('a_minus', models.PositiveIntegerField()),
+                ('b_plus', models.PositiveIntegerField()),
+                ('b', models.PositiveIntegerField()),
+                ('b_minus', models.PositiveIntegerField()),
+                ('c_plus', models.PositiveIntegerField()),
+                ('c', models.PositiveIntegerField()),
+                ('c_minus', models.PositiveIntegerField()),
+                ('d_plus', models.PositiveIntegerField()),
+                ('d', models.PositiveIntegerField()),
+                ('d_minus', models.PositiveIntegerField()),
+                ('f', models.PositiveIntegerField()),
+                ('w', models.PositiveIntegerField()),
+                ('other', models.PositiveIntegerField()),
+                ('department', models.CharField(max_length=4)),
+            ],
+            options={
+                'db_table': 'home_grade_rollup_department',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfessorGradeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', home.models.SemesterField()),
+                ('num_students', models.PositiveIntegerField()),
+                ('a_plus', models.PositiveIntegerField()),
+                ('a', models.PositiveIntegerField()),
+                ('a_minus', models.PositiveIntegerField()),
+                ('b_plus', models.PositiveIntegerField()),
+                ('b', models.PositiveIntegerField()),
+                ('b_minus', models.PositiveIntegerField()),
+                ('c_plus', models.PositiveIntegerField()),
+                ('c', models.PositiveIntegerField()),
+                ('c_minus', models.PositiveIntegerField()),
+                ('d_plus', models.PositiveIntegerField()),
+                ('d', models.PositiveIntegerField()),
+                ('d_minus', models.PositiveIntegerField()),
+                ('f', models.PositiveIntegerField()),
+                ('w', models.PositiveIntegerField()),
+                ('other', models.PositiveIntegerField()),
+                ('professor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='home.professor')),
+            ],
+            options={
+                'db_table': 'home_grade_rollup_professor',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='departmentgraderollup',
+            constraint=models.UniqueConstraint(fields=('department', 'semester'), name='unique_rollup_department_semester'),
+        ),
+        migrations.AddField(
+            model_name='courseprofessorgraderollup',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='home.course'),
+        ),
+        migrations.AddField(
+            model_name='courseprofessorgraderollup',
+            name='professor',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='home.professor'),
+        ),
+        migrations.AddField(
+            model_name='coursegraderollup',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='home.course'),
+        ),
+        migrations.AddConstraint(
+            model_name='professorgraderollup',
+            constraint=models.UniqueConstraint(fields=('professor', 'semester'), name='unique_rollup_professor_semester'),
+        ),
+        migrations.AddIndex(
+            model_name='courseprofessorgraderollup',
+            index=models.Index(fields=['professor', 'semester'], name='home_grade__profess_50fd33_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='courseprofessorgraderollup',
+            constraint=models.UniqueConstraint(fields=('course', 'professor', 'semester'), name='unique_rollup_course_professor_semester'),
+        ),
+        migrations.AddConstraint(
+            model_name='coursegraderollup',
+            constraint=models.UniqueConstraint(fields=('course', 'semester'), name='unique_rollup_course_semester'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.4 on 2026-10-18 20:24
+
+from django.db import migrations, models
+import home.models
+
+# the pass/fail semesters which used to be hardcoded in `home.utils`
+PF_SEMESTERS = ["202001", "202101"]
+
+def add_pf_semesters(apps, _schema_editor):
+    from home.utils import Semester
+    PassFailSemester = apps.get_model("home", "PassFailSemester")
+    for semester in PF_SEMESTERS:
+        PassFailSemester(semester=Semester(semester)).save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0012_grade_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PassFailSemester',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', home.models.SemesterField(unique=True)),
+            ],
+            options={
+                'db_table': 'home_pass_fail_semester',
+            },
+        ),
+        migrations.RunPython(add_pf_semesters, migrations.RunPython.noop),
+    ]
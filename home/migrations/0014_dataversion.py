@@ -0,0 +1,35 @@
+# Generated by Django 3.2.4 on 2026-10-18 20:36
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# the tags of all grade, review, and professor/course data. Start these at
+# version 0 as of now, so every response has a Last-Modified.
+GLOBAL_TAGS = ["grade", "review", "catalog"]
+
+def add_global_versions(apps, _schema_editor):
+    DataVersion = apps.get_model("home", "DataVersion")
+    for tag in GLOBAL_TAGS:
+        DataVersion(tag=tag).save()
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0013_passfailsemester'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=255, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('modified', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'home_data_version',
+            },
+        ),
+        migrations.RunPython(add_global_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.4 on 2026-10-18 22:10
+
+from django.db import migrations
+
+# see home/search_backends.py. These are n-gram indexes so they also match
+# substrings of words, like course codes and partial names. Other databases
+# keep using `LIKE`.
+INDEXES = [
+    ("home_professor", "home_professor_name_fulltext", ["name"]),
+    ("home_course", "home_course_search_fulltext",
+        ["name", "title", "description"])
+]
+
+def supports_fulltext(connection):
+    return connection.vendor == "mysql" and not connection.mysql_is_mariadb
+
+def add_indexes(_apps, schema_editor):
+    if not supports_fulltext(schema_editor.connection):
+        return
+    for (table, name, columns) in INDEXES:
+        columns = ", ".join(columns)
+        schema_editor.execute(f"CREATE FULLTEXT INDEX {name} ON {table} "
+            f"({columns}) WITH PARSER ngram")
+
+def remove_indexes(_apps, schema_editor):
+    if not supports_fulltext(schema_editor.connection):
+        return
+    for (table, name, _columns) in INDEXES:
+        schema_editor.execute(f"DROP INDEX {name} ON {table}")
+
+class Migration(migrations.Migration):
+    # mysql can't create FULLTEXT indexes inside a transaction anyway
+    atomic = False
+
+    dependencies = [
+        ('home', '0014_dataversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_indexes, remove_indexes),
+    ]
@@ -1,5 +1,9 @@
 import re
+import threading
 
+from collections import namedtuple
+from contextlib import contextmanager
+from copy import copy
 from enum import Enum
 
 from django.contrib.auth.models import (AbstractUser,
@@ -7,25 +11,35 @@ from django.contrib.auth.models import (AbstractUser,
 from django.utils.safestring import mark_safe
 from django.utils.functional import cached_property
 from django.utils.html import escape
+from django.utils import timezone
 from django.urls import reverse
 from django.core import validators
+from django.db import transaction
 from django.db.models import (Model, CharField, DateTimeField, TextField,
     IntegerField, BooleanField, ForeignKey, PositiveIntegerField, EmailField,
     CASCADE, ManyToManyField, SlugField, TextChoices, FloatField, Manager,
-    QuerySet, Sum, UniqueConstraint, Index, Count, JSONField)
+    QuerySet, Sum, UniqueConstraint, Index, Count, JSONField, Q, OuterRef,
+    Subquery, F, PositiveBigIntegerField)
+from django.db.models.expressions import Col
+from django.db.models.lookups import Lookup
+from django.db.models.sql.where import WhereNode
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
 
-from fuzzywuzzy import fuzz
 
 class GradeQuerySet(QuerySet):
 
     def exclude_pf(self):
-        from home.utils import PF_SEMESTERS
-        ret = self
-        for semester in PF_SEMESTERS:
-            ret = ret.exclude(semester=semester)
-        return ret
+        from home.utils import pf_semesters
+        semesters = pf_semesters()
+        if not semesters:
+            return self
+        return self.exclude(semester__in=semesters)
 
     def average_gpa(self):
+        rollup = self._rollup()
+        if rollup is not None:
+            return rollup.average_gpa()
         return self._apply_average_gpa(self.aggregate)["average_gpa"]
 
     def average_gpa_annotate(self):
@@ -57,24 +71,213 @@ class GradeQuerySet(QuerySet):
         )
 
     def num_students(self):
+        rollup = self._rollup()
+        if rollup is not None:
+            return rollup.num_students()
         return self.aggregate(
             num_students=Sum("num_students")
         )["num_students"]
 
     def grade_totals_aggregate(self):
-        return (
-            self.aggregate(
-                a_plus_total=Sum("a_plus"), a_total=Sum("a"), a_minus_total=Sum("a_minus"),
-                b_plus_total=Sum("b_plus"), b_total=Sum("b"), b_minus_total=Sum("b_minus"),
-                c_plus_total=Sum("c_plus"), c_total=Sum("c"), c_minus_total=Sum("c_minus"),
-                d_plus_total=Sum("d_plus"), d_total=Sum("d"), d_minus_total=Sum("d_minus"),
-                f_total=Sum("f"), w_total=Sum("w"), other_total=Sum("other")
-            )
+        rollup = self._rollup()
+        if rollup is not None:
+            return rollup.grade_totals_aggregate()
+        return self.aggregate(**self._grade_totals())
+
+    def grade_data_by(self, field):
+        """
+        The equivalent of calling `average_gpa`, `num_students`, and
+        `grade_totals_aggregate` once per distinct value of `field` (eg
+        "course__name"), but in a single grouped query.
+
+        Returns a list of dicts ordered by `field`, with the keys `field`,
+        "average_gpa", "num_students", and the keys of
+        `grade_totals_aggregate`.
+        """
+        queryset = self
+        rollup_field = field
+        rollup = self._rollup(field)
+        if rollup is not None:
+            queryset = rollup
+            rollup_field = _rollup_path(rollup.model, field)
+
+        values = (
+            queryset
+            .values(rollup_field)
+            .order_by(rollup_field)
+            .annotate(total_students=Sum("num_students"), **self._grade_totals())
+            .average_gpa_annotate()
         )
 
+        data = []
+        for value in values:
+            value[field] = value.pop(rollup_field)
+            value["num_students"] = value.pop("total_students")
+            data.append(value)
+        return data
+
+    def _grade_totals(self):
+        return {
+            f"{field}_total": Sum(field) for field in Grade.GRADE_FIELDS
+        }
+
+    def _rollup(self, *group_by):
+        """
+        Returns an equivalent queryset over one of the `GradeRollup` tables if
+        this queryset only filters (and is only grouped by `group_by`) on
+        course, professor, department, and semester, or `None` if it does
+        anything else (eg filters on section, or is sliced) and must be
+        computed from the raw grades. Not intended for external use.
+        """
+        query = self.query
+        if (
+            self.model is not Grade or query.is_sliced or query.distinct or
+            query.combinator or query.annotations or query.group_by or
+            query.extra
+        ):
+            return None
+
+        lookups = []
+        if not _collect_rollup_lookups(query.where, False, lookups):
+            return None
+
+        dimensions = {_rollup_dimension(path) for (path, *_rest) in lookups}
+        dimensions |= {_rollup_dimension(path) for path in group_by}
+        dimensions.discard("semester")
+        if None in dimensions:
+            return None
+
+        if "professor" in dimensions:
+            if dimensions & {"course", "department"}:
+                model = CourseProfessorGradeRollup
+            else:
+                model = ProfessorGradeRollup
+        elif "course" in dimensions:
+            model = CourseGradeRollup
+        else:
+            # every grade belongs to exactly one department, so the department
+            # rollups also cover the unfiltered case.
+            model = DepartmentGradeRollup
+
+        rollups = model.objects.all()
+        for (path, lookup_name, value, negated) in lookups:
+            path = _rollup_path(model, path)
+            q = Q(**{f"{path}__{lookup_name}": value})
+            rollups = rollups.exclude(q) if negated else rollups.filter(q)
+        return rollups
+
     average_gpa.queryset_only = True
     num_students.queryset_only = True
 
+
+def _collect_rollup_lookups(node, negated, lookups):
+    """
+    Flattens the where clause of a `Grade` queryset into
+    `(path, lookup_name, value, negated)` tuples, appending them to
+    `lookups`. Returns `False` if the clause contains anything that the grade
+    rollups can't answer.
+    """
+    from home.utils import Semester
+
+    if isinstance(node, WhereNode):
+        negated = negated != node.negated
+        # ORs (including negated ANDs) can't be expressed as a series of
+        # filter/exclude calls. Allow plain ANDs and the common `NOT (a)` case.
+        if len(node.children) > 1 and (negated or node.connector != "AND"):
+            return False
+        return all(_collect_rollup_lookups(child, negated, lookups)
+            for child in node.children)
+
+    if not isinstance(node, Lookup) or not isinstance(node.lhs, Col):
+        return False
+    if node.lookup_name not in ["exact", "in", "gt", "gte", "lt", "lte"]:
+        return False
+
+    field = node.lhs.target
+    if field.model is Grade and field.name in ["course", "professor", "semester"]:
+        path = field.name
+    elif field.model is Course and field.name == "department":
+        path = "course__department"
+    else:
+        return False
+
+    value = node.rhs
+    if value is None:
+        return False
+    # semesters have already been prepared into their database representation
+    # by this point.
+    if path == "semester":
+        if node.lookup_name == "in":
+            value = [Semester(v) for v in value]
+        else:
+            value = Semester(value)
+
+    lookups.append((path, node.lookup_name, value, negated))
+    return True
+
+def _rollup_dimension(path):
+    """
+    The dimension a `Grade` lookup path (eg "course__name") belongs to, for
+    the purposes of picking a grade rollup table, or `None` if no rollup
+    tracks it.
+    """
+    (first, *rest) = path.split("__")
+    if first == "course":
+        return "department" if rest == ["department"] else "course"
+    if first in ["professor", "semester"]:
+        return first
+    return None
+
+def _rollup_path(model, path):
+    """
+    Translates a `Grade` lookup path into the equivalent path on the rollup
+    `model`.
+    """
+    if model is DepartmentGradeRollup and path == "course__department":
+        return "department"
+    return path
+
+class CourseQuerySet(QuerySet):
+
+    def average_gpa_annotate(self):
+        """
+        Annotates `average_gpa_` on each course, with the same value as
+        `Course#average_gpa`, but in the same query that fetches the courses.
+        Stored in `average_gpa_` so it doesn't shadow `Course#average_gpa`.
+        """
+        from home.utils import Semester
+        average_gpa = (
+            CourseGradeRollup.objects
+            .filter(course=OuterRef("pk"))
+            # TODO dont hardcode recent semester (see `RecentGradeManager`)
+            .filter(semester__gte=Semester(201201))
+            .values("course")
+            .average_gpa_annotate()
+            .values("average_gpa")
+        )
+        return self.annotate(average_gpa_=Subquery(average_gpa))
+
+class ProfessorQuerySet(QuerySet):
+
+    def average_rating_annotate(self):
+        """
+        Annotates `num_reviews` and `average_rating_` (the same value as
+        `Professor#average_rating`) on each professor, in the same query that
+        fetches the professors. Stored in `average_rating_` so we don't
+        accidentally access `average_rating` and compute the average rating
+        per professor.
+        """
+        verified = Q(review__status=Review.Status.VERIFIED)
+        return self.annotate(
+            num_reviews=Count("review", filter=verified),
+            average_rating_=(
+                Sum("review__rating", output_field=FloatField(),
+                    filter=verified)
+                /
+                Count("review", filter=verified)
+            )
+        )
+
 class RecentGradeManager(Manager):
     def get_queryset(self):
         from home.utils import Semester
@@ -120,13 +323,13 @@ class ReviewRejectedManager(Manager):
     def get_queryset(self):
         return super().get_queryset().filter(status=Review.Status.REJECTED)
 
-class ProfessorVerifiedManager(Manager):
+class ProfessorVerifiedManager(Manager.from_queryset(ProfessorQuerySet)):
     def get_queryset(self):
         return super().get_queryset().filter(status=Professor.Status.VERIFIED)
-class ProfessorPendingManager(Manager):
+class ProfessorPendingManager(Manager.from_queryset(ProfessorQuerySet)):
     def get_queryset(self):
         return super().get_queryset().filter(status=Professor.Status.PENDING)
-class ProfessorRejectedManager(Manager):
+class ProfessorRejectedManager(Manager.from_queryset(ProfessorQuerySet)):
     def get_queryset(self):
         return super().get_queryset().filter(status=Professor.Status.REJECTED)
 
@@ -197,8 +400,8 @@ class Course(Model):
     professors = ManyToManyField("Professor", blank=True,
         through="ProfessorCourse")
 
-    recent = RecentCourseManager()
-    unfiltered = Manager()
+    recent = RecentCourseManager.from_queryset(CourseQuerySet)()
+    unfiltered = Manager.from_queryset(CourseQuerySet)()
 
     course_code_format = '[A-Za-z]{4}(?:[0-9]){3,6}'
 
@@ -260,7 +463,7 @@ class Professor(Model):
     verified = ProfessorVerifiedManager()
     pending = ProfessorPendingManager()
     rejected = ProfessorRejectedManager()
-    unfiltered = Manager()
+    unfiltered = Manager.from_queryset(ProfessorQuerySet)()
 
     name = CharField(max_length=100)
     slug = SlugField(max_length=100, null=True, unique=True)
@@ -286,16 +489,13 @@ class Professor(Model):
 
     @staticmethod
     def find_similar(professor_name, tolerance):
-        similar_professors = []
-        for professor in Professor.verified.all():
-            ratio = fuzz.ratio(professor_name, professor.name)
-            if ratio > tolerance:
-                similar_professors.append({"professor" : professor, "ratio" : ratio})
-
-        similar_professors.sort(key=lambda e: e["ratio"], reverse=True)
-        similar_professors = [p["professor"] for p in similar_professors]
-
-        return similar_professors
+        """
+        The verified professors whose names have a `fuzz.ratio` above
+        `tolerance` with `professor_name`, most similar first.
+        """
+        # avoid circular import
+        from home.fuzzy import similar_name_index
+        return similar_name_index().find(professor_name, tolerance)
 
     def __str__(self):
         return f"{self.name} ({self.id})"
@@ -486,6 +686,8 @@ class Review(Model):
 class Grade(Model):
     POSSIBLE_GRADES = [choice[0] for choice in Review.Grades.choices]
     VOWEL_GRADES = ["A", "A-", "A+", "F", "XF"]
+    GRADE_FIELDS = ["a_plus", "a", "a_minus", "b_plus", "b", "b_minus",
+        "c_plus", "c", "c_minus", "d_plus", "d", "d_minus", "f", "w", "other"]
 
     course = ForeignKey(Course, CASCADE)
     professor = ForeignKey(Professor, CASCADE, null=True)
@@ -536,6 +738,192 @@ class Grade(Model):
             f"{self.f} {self.w} {self.other}"
         )
 
+
+class GradeRollup(Model):
+    """
+    The sum of every `Grade` row in a single semester, grouped by some
+    dimension (course, professor, etc). `GradeQuerySet` reads from these tables
+    instead of `home_grade` whenever it can, so a grade aggregate costs the same
+    no matter how many sections a course has.
+
+    These tables are derived data and must be kept in sync with `Grade` via
+    `update_grade_rollups` whenever grades are added or reassigned.
+    """
+    # the `Grade` fields which the rolled up rows are grouped by.
+    group_by = []
+
+    semester = SemesterField()
+    num_students = PositiveIntegerField()
+    a_plus  = PositiveIntegerField()
+    a       = PositiveIntegerField()
+    a_minus = PositiveIntegerField()
+    b_plus  = PositiveIntegerField()
+    b       = PositiveIntegerField()
+    b_minus = PositiveIntegerField()
+    c_plus  = PositiveIntegerField()
+    c       = PositiveIntegerField()
+    c_minus = PositiveIntegerField()
+    d_plus  = PositiveIntegerField()
+    d       = PositiveIntegerField()
+    d_minus = PositiveIntegerField()
+    f       = PositiveIntegerField()
+    w       = PositiveIntegerField()
+    other   = PositiveIntegerField()
+
+    objects = Manager.from_queryset(GradeQuerySet)()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def rebuild(cls, *, semesters=None, professors=None, keys=None):
+        """
+        Recomputes the rows of this rollup for the given semesters and/or
+        professors, or the entire table if neither is passed.
+
+        If `keys` is passed instead, only recomputes the rows which a grade
+        with any of those keys is summed into. See `GradeRollupKey`.
+        """
+        rollups = cls.objects.all()
+        grades = Grade.unfiltered.all()
+        if semesters is not None:
+            rollups = rollups.filter(semester__in=semesters)
+            grades = grades.filter(semester__in=semesters)
+        if professors is not None:
+            # reassigning grades between professors doesn't change the totals
+            # of any rollup which isn't grouped by professor.
+            if "professor" not in cls.group_by:
+                return
+            rollups = rollups.filter(professor__in=professors)
+            grades = grades.filter(professor__in=professors)
+        if keys is not None:
+            if not keys:
+                return
+            rollup_filter = Q()
+            grade_filter = Q()
+            for key in keys:
+                values = {
+                    "course": key.course,
+                    "professor": key.professor,
+                    "course__department": key.department
+                }
+                # a null professor filters on `IS NULL`, as we want
+                rollup_filter |= Q(semester=key.semester,
+                    **{cls.rollup_field(field): values[field]
+                    for field in cls.group_by})
+                grade_filter |= Q(semester=key.semester,
+                    **{field: values[field] for field in cls.group_by})
+            rollups = rollups.filter(rollup_filter)
+            grades = grades.filter(grade_filter)
+
+        values = (
+            grades
+            .values(*cls.group_by, "semester")
+            .order_by()
+            .annotate(
+                num_students_total=Sum("num_students"),
+                **{f"{field}_total": Sum(field) for field in Grade.GRADE_FIELDS}
+            )
+        )
+
+        new_rollups = []
+        for value in values:
+            kwargs = {
+                cls.rollup_field(field): value[field] for field in cls.group_by
+            }
+            for field in ["num_students", *Grade.GRADE_FIELDS]:
+                kwargs[field] = value[f"{field}_total"]
+            new_rollups.append(cls(semester=value["semester"], **kwargs))
+
+        rollups.delete()
+        cls.objects.bulk_create(new_rollups, batch_size=1000)
+
+    @staticmethod
+    def rollup_field(group_field):
+        if group_field in ["course", "professor"]:
+            return f"{group_field}_id"
+        # course__department -> department
+        return group_field.split("__")[-1]
+
+
+class CourseGradeRollup(GradeRollup):
+    group_by = ["course"]
+
+    course = ForeignKey(Course, CASCADE)
+
+    class Meta:
+        db_table = "home_grade_rollup_course"
+        constraints = [
+            UniqueConstraint(fields=["course", "semester"],
+                name="unique_rollup_course_semester")
+        ]
+
+
+class ProfessorGradeRollup(GradeRollup):
+    group_by = ["professor"]
+
+    professor = ForeignKey(Professor, CASCADE, null=True)
+
+    class Meta:
+        db_table = "home_grade_rollup_professor"
+        constraints = [
+            UniqueConstraint(fields=["professor", "semester"],
+                name="unique_rollup_professor_semester")
+        ]
+
+
+class CourseProfessorGradeRollup(GradeRollup):
+    group_by = ["course", "professor"]
+
+    course = ForeignKey(Course, CASCADE)
+    professor = ForeignKey(Professor, CASCADE, null=True)
+
+    class Meta:
+        db_table = "home_grade_rollup_course_professor"
+        constraints = [
+            UniqueConstraint(fields=["course", "professor", "semester"],
+                name="unique_rollup_course_professor_semester")
+        ]
+        indexes = [
+            Index(fields=["professor", "semester"])
+        ]
+
+
+class DepartmentGradeRollup(GradeRollup):
+    group_by = ["course__department"]
+
+    department = CharField(max_length=4)
+
+    class Meta:
+        db_table = "home_grade_rollup_department"
+        constraints = [
+            UniqueConstraint(fields=["department", "semester"],
+                name="unique_rollup_department_semester")
+        ]
+
+
+GRADE_ROLLUPS = [CourseGradeRollup, ProfessorGradeRollup,
+    CourseProfessorGradeRollup, DepartmentGradeRollup]
+
+# the semester, course id, professor id (or None), and course department of a
+# grade, which decide the rows of each rollup it's summed into.
+GradeRollupKey = namedtuple("GradeRollupKey",
+    ["semester", "course", "professor", "department"])
+
+def update_grade_rollups(*, semesters=None, professors=None, keys=None):
+    """
+    Brings every grade rollup table back in sync with `Grade` after grades in
+    `semesters` were added, or grades were moved to or from `professors`. Pass
+    neither to rebuild the rollups from scratch, or `keys` (a collection of
+    `GradeRollupKey`) to rebuild only the rows grades with those keys are
+    summed into.
+    """
+    with transaction.atomic():
+        for rollup in GRADE_ROLLUPS:
+            rollup.rebuild(semesters=semesters, professors=professors,
+                keys=keys)
+
+
 class Organization(Model):
     name = TextField()
     url = TextField()
@@ -548,6 +936,21 @@ class Organization(Model):
         return f"{self.name} ({self.website_url})"
 
 
+class PassFailSemester(Model):
+    """
+    A semester in which UMD allowed students to take any course pass/fail.
+    Grades from these semesters are excluded from our statistics by default
+    (see `GradeQuerySet.exclude_pf`).
+    """
+    class Meta:
+        db_table = "home_pass_fail_semester"
+
+    semester = SemesterField(unique=True)
+
+    def __str__(self):
+        return self.semester.name()
+
+
 class ProfessorCourse(Model):
     class Meta:
         db_table = "home_professor_course"
@@ -606,3 +1009,244 @@ class UserSchedule(Model):
 
     def __str__(self):
         return f"schedule by {self.user} for {self.semester}"
+
+
+class DataVersion(Model):
+    """
+    A version number for the data with a certain ttl cache tag (see
+    `cache_tag`), which is incremented whenever that data changes. These
+    persist and are seen by every process, so they can be handed to clients as
+    ETags (see `data_version_condition`), and tell the ttl caches of every
+    process when a tag was invalidated (unless the ttl caches are shared).
+
+    Tags which have never changed have no row, and are at version 0.
+    """
+    class Meta:
+        db_table = "home_data_version"
+
+    tag = CharField(max_length=255, unique=True)
+    version = PositiveBigIntegerField(default=0)
+    modified = DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.tag} (version {self.version})"
+
+    @staticmethod
+    def bump(tags):
+        tags = set(tags)
+        with transaction.atomic():
+            # create any missing rows at version 0 first, so that concurrent
+            # bumps of a new tag both count.
+            DataVersion.objects.bulk_create(
+                [DataVersion(tag=tag) for tag in tags], ignore_conflicts=True)
+            DataVersion.objects.filter(tag__in=tags).update(
+                version=F("version") + 1, modified=timezone.now())
+
+    @staticmethod
+    def versions(tags):
+        """
+        The current version of each of `tags`, in the same order.
+        """
+        if not tags:
+            return ()
+        rows = dict(DataVersion.objects.filter(tag__in=tags).values_list(
+            "tag", "version"))
+        return tuple(rows.get(tag, 0) for tag in tags)
+
+    @staticmethod
+    def current(tags):
+        """
+        Returns `(versions, modified)`, where `versions` is a string
+        identifying the current version of every tag in `tags`, and `modified`
+        is the last time any of them changed (or `None`).
+        """
+        rows = DataVersion.objects.filter(tag__in=tags).values_list("tag",
+            "version", "modified")
+        versions = {tag: 0 for tag in tags}
+        modified = None
+        for (tag, version, row_modified) in rows:
+            versions[tag] = version
+            modified = max(modified or row_modified, row_modified)
+
+        versions = ",".join(f"{tag}={version}" for tag, version in
+            sorted(versions.items()))
+        return (versions, modified)
+
+
+# Writes to these models invalidate the ttl cache entries which depend on them
+# (see `ttl_cache` in home/utils.py), and bump their `DataVersion`s. Bulk
+# operations don't send signals, so callers of `bulk_create` and
+# `QuerySet.update` on these models need to call `invalidate_caches` (or
+# `invalidate_tags`) themselves.
+
+def invalidate_tags(*tags):
+    # avoid circular import
+    from home.utils import invalidate_ttl_cache
+    # also bumps their data versions
+    invalidate_ttl_cache(*tags)
+
+def invalidate_caches(kind, *, courses=(), professors=()):
+    """
+    Invalidates the ttl cache entries which depend on the `kind` ("grade" or
+    "review") data of any of `courses` or `professors` (as ids), or on all
+    `kind` data.
+    """
+    # avoid circular import
+    from home.utils import cache_tag
+    tags = [kind]
+
+    courses = set(courses) - {None}
+    names = Course.unfiltered.filter(id__in=courses).values_list("name",
+        flat=True)
+    tags += [cache_tag(kind, "course", name) for name in names]
+
+    # some caches look professors up by slug, and others by name.
+    professors = set(professors) - {None}
+    professors = Professor.unfiltered.filter(id__in=professors).values_list(
+        "slug", "name")
+    for (slug, name) in professors:
+        tags += [cache_tag(kind, "professor", slug),
+            cache_tag(kind, "professor", name)]
+
+    invalidate_tags(*tags)
+
+# the rollup keys of grades written by this thread since its last commit.
+# Grades are almost always written in bulk, by `importgradedata`, which
+# rebuilds the rollups itself. The signals below catch the odd edit through the
+# django admin panel, and the grades deleted along with a course or professor.
+# Those can be thousands of rows in one transaction, so instead of rebuilding
+# their rollups once per row, we collect their keys and rebuild every affected
+# row once, when the transaction commits.
+_pending_grades = threading.local()
+
+def _grade_rollup_key(semester, course_id, professor_id):
+    # the department of each course, cached until the pending grades are
+    # flushed, so deleting a course doesn't look it up for every grade (and
+    # after the commit, the course may be gone).
+    departments = _pending_grades.__dict__.setdefault("departments", {})
+    if course_id not in departments:
+        departments[course_id] = (
+            Course.unfiltered.filter(pk=course_id)
+            .values_list("department", flat=True)
+            .first()
+        )
+    return GradeRollupKey(semester, course_id, professor_id,
+        departments[course_id])
+
+def _add_pending_grade(key):
+    _pending_grades.__dict__.setdefault("keys", set()).add(key)
+    # runs right away if we're not in a transaction. Only the first callback
+    # of a transaction finds any keys left to flush.
+    transaction.on_commit(_flush_pending_grades)
+
+def _flush_pending_grades():
+    keys = _pending_grades.__dict__.pop("keys", set())
+    _pending_grades.__dict__.pop("departments", None)
+    if not keys:
+        return
+    update_grade_rollups(keys=keys)
+    invalidate_caches("grade", courses={key.course for key in keys},
+        professors={key.professor for key in keys})
+
+@receiver(pre_save, sender=Grade)
+def _remember_grade_rollup_key(instance, raw, **_kwargs):
+    # an edit can move a grade to another semester, course or professor, whose
+    # rollups need rebuilding as well as those of the new ones.
+    if raw or instance.pk is None:
+        return
+    before = (
+        Grade.unfiltered.filter(pk=instance.pk)
+        .values_list("semester", "course_id", "professor_id")
+        .first()
+    )
+    if before:
+        instance._rollup_key_before = _grade_rollup_key(*before)
+
+@receiver(post_save, sender=Grade)
+def _invalidate_saved_grade(instance, raw, **_kwargs):
+    # fixtures are loaded in bulk, and should be followed by
+    # `updategraderollups`
+    if raw:
+        return
+    before = instance.__dict__.pop("_rollup_key_before", None)
+    if before:
+        _add_pending_grade(before)
+    _add_pending_grade(_grade_rollup_key(instance.semester,
+        instance.course_id, instance.professor_id))
+
+@receiver(post_delete, sender=Grade)
+def _invalidate_deleted_grade(instance, **_kwargs):
+    _add_pending_grade(_grade_rollup_key(instance.semester,
+        instance.course_id, instance.professor_id))
+
+@receiver([post_save, post_delete], sender=Review)
+def _invalidate_review_caches(instance, **_kwargs):
+    invalidate_caches("review", courses=[instance.course_id],
+        professors=[instance.professor_id])
+
+@receiver([post_save, post_delete], sender=PassFailSemester)
+def _invalidate_pass_fail_caches(**_kwargs):
+    # every grade statistic which excludes pass/fail semesters is tagged with
+    # "pass_fail" as well
+    invalidate_tags("pass_fail")
+
+# the tags invalidated by catalog writes on this thread since its last commit,
+# or since it entered `batch_invalidations`. Every catalog cache depends on
+# every course and professor, and `updatecourses` writes thousands of them, so
+# instead of invalidating "catalog" (and rebuilding those caches) once per row,
+# we invalidate it once per transaction or batch.
+_pending_tags = threading.local()
+
+def _add_pending_tags(*tags):
+    _pending_tags.__dict__.setdefault("tags", set()).update(tags)
+    if not getattr(_pending_tags, "batches", 0):
+        # runs right away if we're not in a transaction. Only the first
+        # callback of a transaction finds any tags left to flush.
+        transaction.on_commit(_flush_pending_tags)
+
+def _flush_pending_tags():
+    tags = _pending_tags.__dict__.pop("tags", set())
+    if tags:
+        invalidate_tags(*tags)
+
+@contextmanager
+def batch_invalidations():
+    """
+    Defers the cache invalidations of catalog writes made in this block to its
+    end (or the end of the transaction it's in), so they happen once. For
+    commands which write many rows outside of a transaction.
+    """
+    _pending_tags.batches = getattr(_pending_tags, "batches", 0) + 1
+    try:
+        yield
+    finally:
+        _pending_tags.batches -= 1
+        if not _pending_tags.batches:
+            transaction.on_commit(_flush_pending_tags)
+
+@receiver(post_save, sender=Professor)
+def _update_saved_similar_name(instance, **_kwargs):
+    # avoid circular import
+    from home.fuzzy import update_similar_name_index
+    # index a copy, since `instance` may be changed again (or deleted, which
+    # clears its pk) while it's indexed
+    professor = copy(instance)
+    name = (professor.name if professor.status == Professor.Status.VERIFIED
+        else None)
+    transaction.on_commit(lambda: update_similar_name_index(professor, name))
+
+@receiver(post_delete, sender=Professor)
+def _update_deleted_similar_name(instance, **_kwargs):
+    # avoid circular import
+    from home.fuzzy import update_similar_name_index
+    # the instance's pk is cleared once it's deleted, so use a copy, which is
+    # equal to it.
+    professor = Professor(pk=instance.pk)
+    transaction.on_commit(lambda: update_similar_name_index(professor, None))
+
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=Professor)
+@receiver([post_save, post_delete], sender=ProfessorCourse)
+@receiver([post_save, post_delete], sender=ProfessorAlias)
+def _invalidate_catalog_caches(**_kwargs):
+    _add_pending_tags("catalog")
@@ -1,27 +1,142 @@
-from itertools import chain, islice
+from django.db.models import Value, IntegerField
 
-from django.db.models import Q
+from home.models import Grade, Professor, Course
+from home.utils import ttl_cache
+from home.search_backends import search_backend
+from home.fuzzy import fuzzy_index
 
-from home.models import Professor, Course
+def search(search, num_results, *, offset=0, professors=False, courses=False,
+    fuzzy=False):
+    """
+    `num_results` of the professors and courses matching `search`, starting at
+    `offset`. Results are ordered by relevance, then professors before
+    courses, then by name. If `fuzzy` is true, these are followed by the ones
+    which match apart from a few typos (see `home/fuzzy.py`).
 
-def search(search, num_results, *, offset=0, professors=False, courses=False):
+    Only the requested page is fetched from the database, so a deep page costs
+    as much as the first.
+    """
+    return _search(_normalize(search), num_results, offset, professors,
+        courses, fuzzy)
+
+def search_count(search, *, professors=False, courses=False, fuzzy=False):
+    """
+    The total number of results of `search` with these arguments. With
+    `fuzzy`, this is an estimate, since the same professor or course can be
+    both an exact and a fuzzy match.
+    """
+    return _search_count(_normalize(search), professors, courses, fuzzy)
+
+def _normalize(search):
+    # every search backend is case-insensitive, so this only merges searches
+    # which would have the same results anyway.
+    return search.lower()
+
+# a few searches (departments, popular courses and professors) make up most of
+# our search traffic, so cache every search until the catalog changes.
+@ttl_cache(24 * 60 * 60, max_entries=10_000, tags=["catalog"])
+def _search(search, num_results, offset, professors, courses, fuzzy):
     # TODO: allow option to search all professors
-    professors_q = (
-        Professor.verified
-        .filter(name__icontains=search)
-        .order_by("name")
-    )
-    courses_q = (
-        Course.recent
-        .filter(Q(name__icontains=search) | Q(title__icontains=search))
-        .order_by("name")
-    )
-    iterables = []
+    backend = search_backend()
+    querysets = []
     # professors before courses if both are passed
     if professors:
-        iterables.append(professors_q)
+        querysets.append((Professor, backend.professors(search)))
+    if courses:
+        querysets.append((Course, backend.courses(search)))
+
+    results = _search_page(querysets, offset, num_results)
+    if not fuzzy or len(results) == num_results:
+        return results
+
+    # the fuzzy matches come after every exact match, so we need to know how
+    # many exact matches there are to know where this page starts in them.
+    if results or offset == 0:
+        num_exact = offset + len(results)
+    else:
+        num_exact = _search_count(search, professors, courses, False)
+    fuzzy_results = fuzzy_index().search(search, professors=professors,
+        courses=courses)
+    fuzzy_results = _exclude_matches(fuzzy_results, querysets)
+
+    start = max(offset - num_exact, 0)
+    return results + fuzzy_results[start:start + num_results - len(results)]
+
+@ttl_cache(24 * 60 * 60, max_entries=10_000, tags=["catalog"])
+def _search_count(search, professors, courses, fuzzy):
+    backend = search_backend()
+    count = 0
+    if professors:
+        count += backend.professors(search).count()
     if courses:
-        iterables.append(courses_q)
+        count += backend.courses(search).count()
+    if fuzzy:
+        count += len(fuzzy_index().search(search, professors=professors,
+            courses=courses))
+    return count
+
+def _search_page(querysets, offset, num_results):
+    if not querysets or num_results == 0:
+        return []
+
+    # select just enough of each result to order them in a single UNION query,
+    # then fetch the page's objects.
+    parts = []
+    for (i, (_model, queryset)) in enumerate(querysets):
+        parts.append(
+            queryset
+            .annotate(model=Value(i, output_field=IntegerField()))
+            .order_by()
+            .values_list("model", "pk", "relevance", "name")
+        )
+    page = (
+        parts[0]
+        .union(*parts[1:], all=True)
+        .order_by("-relevance", "model", "name")
+        [offset:offset + num_results]
+    )
+    page = list(page)
+
+    objects = []
+    for (i, (model, queryset)) in enumerate(querysets):
+        pks = [pk for (model_i, pk, _relevance, _name) in page if model_i == i]
+        objects.append(model.unfiltered.in_bulk(pks) if pks else {})
+    return [objects[i][pk] for (i, pk, _relevance, _name) in page]
+
+def _exclude_matches(objects, querysets):
+    """
+    `objects`, without those matched by any of `querysets`.
+    """
+    matched = set()
+    for (model, queryset) in querysets:
+        pks = [obj.pk for obj in objects if isinstance(obj, model)]
+        if pks:
+            matched.update((model, pk) for pk in
+                queryset.filter(pk__in=pks).values_list("pk", flat=True))
+    return [obj for obj in objects if (type(obj), obj.pk) not in matched]
+
+@ttl_cache(24 * 60 * 60 * 7, tags=["grade", "pass_fail"])
+def department_grades():
+    """
+    The average gpa and number of students of every department with at least
+    100 recent students, as a list of `(department, average_gpa, num_students)`
+    tuples ordered by department.
+    """
+    # avoid circular import
+    from home.grade_matrix import grade_matrix
+
+    matrix = grade_matrix()
+    if matrix is not None:
+        values = matrix.grade_data_by("course__department", recent=True,
+            exclude_pf=True)
+    else:
+        values = Grade.recent.exclude_pf().grade_data_by("course__department")
 
-    results = chain(*iterables)
-    return list(islice(results, offset, num_results))
+    data = []
+    for value in values:
+        average_gpa = value["average_gpa"]
+        num_students = value["num_students"]
+        if num_students < 100 or average_gpa is None:
+            continue
+        data.append((value["course__department"], average_gpa, num_students))
+    return data
@@ -0,0 +1,129 @@
+"""
+The backends behind `queries.search`, which find the professors and courses
+matching a search.
+
+`LikeSearchBackend` works on any database, but a substring match is a
+`LIKE '%...%'`, which can't use an index, so every search scans both tables.
+`FulltextSearchBackend` instead uses the n-gram FULLTEXT indexes added in
+migration 0015, and ranks results by relevance. It needs MySQL (MariaDB has no
+n-gram parser).
+
+The backend is chosen by `SEARCH_BACKEND` in `config.py` ("fulltext" or
+"like"). By default we use the fulltext backend wherever it's supported.
+"""
+from django.db import connection
+from django.db.models import Q, F, Case, When, FloatField
+from django.db.models.expressions import RawSQL
+
+from home.models import Professor, Course
+from planetterp import config
+
+def search_backend():
+    """
+    The configured `SearchBackend`.
+    """
+    name = getattr(config, "SEARCH_BACKEND", None)
+    if name is None:
+        name = "fulltext" if supports_fulltext(connection) else "like"
+    return BACKENDS[name]
+
+def supports_fulltext(connection):
+    return connection.vendor == "mysql" and not connection.mysql_is_mariadb
+
+
+class SearchBackend:
+    def professors(self, search):
+        """
+        The verified professors matching `search`, with a `relevance`
+        annotation, in the order they should be shown (most relevant first).
+        """
+        raise NotImplementedError()
+
+    def courses(self, search):
+        """
+        The recent courses matching `search`, with a `relevance` annotation,
+        in the order they should be shown (most relevant first).
+        """
+        raise NotImplementedError()
+
+
+class LikeSearchBackend(SearchBackend):
+    def professors(self, search):
+        return (
+            Professor.verified
+            .filter(name__icontains=search)
+            .annotate(relevance=self._relevance(search))
+            .order_by("-relevance", "name")
+        )
+
+    def courses(self, search):
+        return (
+            Course.recent
+            .filter(Q(name__icontains=search) | Q(title__icontains=search))
+            .annotate(relevance=self._relevance(search))
+            .order_by("-relevance", "name")
+        )
+
+    @staticmethod
+    def _relevance(search):
+        # an exact name (eg a full course code), then names starting with the
+        # search, then everything else.
+        return Case(
+            When(name__iexact=search, then=2.0),
+            When(name__istartswith=search, then=1.0),
+            default=0.0,
+            output_field=FloatField()
+        )
+
+
+class FulltextSearchBackend(SearchBackend):
+    # mysql's `ngram_token_size` (2 by default). Shorter searches have no
+    # n-grams to match against, so they fall back to `LIKE`.
+    MIN_LENGTH = 2
+    # the columns of the indexes in migration 0015, in the same order, since
+    # MATCH has to name exactly the columns of an index.
+    PROFESSOR_COLUMNS = ["name"]
+    COURSE_COLUMNS = ["name", "title", "description"]
+
+    def professors(self, search):
+        if len(search) < self.MIN_LENGTH:
+            return LikeSearchBackend().professors(search)
+        return self._search(Professor.verified, self.PROFESSOR_COLUMNS, search)
+
+    def courses(self, search):
+        if len(search) < self.MIN_LENGTH:
+            return LikeSearchBackend().courses(search)
+        return self._search(Course.recent, self.COURSE_COLUMNS, search)
+
+    def _search(self, queryset, columns, search):
+        # MATCH only measures how much of a row matches, so eg a course whose
+        # description mentions "CMSC131" a few times could outrank CMSC131
+        # itself. Rank names like `LikeSearchBackend` does first, and within
+        # each rank by MATCH, scaled to [0, 1) so it can't cross ranks.
+        match = F("match_relevance")
+        return (
+            queryset
+            .annotate(match_relevance=self._match(queryset.model, columns,
+                search))
+            .filter(match_relevance__gt=0)
+            .annotate(relevance=LikeSearchBackend._relevance(search) +
+                match / (match + 1.0))
+            .order_by("-relevance", "name")
+        )
+
+    @staticmethod
+    def _match(model, columns, search):
+        table = model._meta.db_table
+        columns = ", ".join(f"{table}.{column}" for column in columns)
+        # search for the whole string as a phrase, ie its n-grams in order,
+        # which is a substring match like `icontains`. Quotes would end the
+        # phrase early, and there's nothing else to escape inside a phrase.
+        phrase = '"' + search.replace('"', " ") + '"'
+        return RawSQL(f"MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)",
+            [phrase], output_field=FloatField())
+
+
+BACKENDS = {
+    "like": LikeSearchBackend(),
+    "fulltext": FulltextSearchBackend()
+}
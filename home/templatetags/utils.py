@@ -31,3 +31,31 @@ def current_semester():
 @register.simple_tag
 def config_value(name):
     return getattr(config, name, "")
+
+@register.tag
+def page_cache(parser, token):
+    """
+    Renders the enclosed fragment through the view's `utils.PageCache`, which
+    must be in the context as `page_cache`. For example:
+
+        {% page_cache "reviews" %}
+            ...
+        {% endpage_cache %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"{bits[0]} takes one argument, "
+            "the name of the fragment")
+    nodelist = parser.parse(("endpage_cache",))
+    parser.delete_first_token()
+    return PageCacheNode(nodelist, parser.compile_filter(bits[1]))
+
+class PageCacheNode(template.Node):
+    def __init__(self, nodelist, fragment):
+        self.nodelist = nodelist
+        self.fragment = fragment
+
+    def render(self, context):
+        page_cache = context["page_cache"]
+        fragment = self.fragment.resolve(context)
+        return page_cache.render(fragment, lambda: self.nodelist.render(context))
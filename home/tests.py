@@ -1,3 +1,996 @@
-from django.test import TestCase
+import sys
+import time
+import gzip
+import json
+import subprocess
+from threading import Event
+from unittest import skipIf, mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum, Case, When, FloatField
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.renderers import JSONRenderer
+
+from home.models import (Course, Professor, ProfessorCourse, ProfessorAlias,
+    Grade, Review, PassFailSemester, DataVersion, update_grade_rollups,
+    GRADE_ROLLUPS, batch_invalidations)
+from home import queries
+from home.fuzzy import SimilarNameIndex
+from home.search_backends import FulltextSearchBackend
+from home.views.data_sources import GradeData
+from home.grade_matrix import GradeMatrix, np
+from api.serializers import GradeSerializer
+from api.pagination import encode_cursor
+from home import utils
+from home.utils import (Semester, ttl_cache, recompute_ttl_cache, cache_tag,
+    invalidate_ttl_cache, pf_semesters, ttl_caches, tag_versions)
+
+
+def create_grade(course, professor, semester, section, **grades):
+    grades = {field: grades.get(field, 1) for field in Grade.GRADE_FIELDS}
+    # writing a grade rebuilds its rollups when the transaction commits, which
+    # never happens in a `TestCase`
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        return Grade.unfiltered.create(course=course, professor=professor,
+            semester=Semester(semester), section=section,
+            num_students=sum(grades.values()), **grades)
+
+
+class CacheTestCase(TestCase):
+    def setUp(self):
+        # data versions are rolled back after every test, but this process's
+        # ttl caches and copy of the data versions aren't. An entry cached by
+        # an earlier test could otherwise look current once the versions catch
+        # up again.
+        for cache_ in ttl_caches:
+            cache_.clear()
+        tag_versions.clear()
+
+
+class InlineExecutor:
+    """
+    Runs ttl cache recomputations on the calling thread, where they can see the
+    test's transaction, and are done by the time the call returns.
+    """
+    def submit(self, function, *args, **kwargs):
+        function(*args, **kwargs)
+
+
+class APITestCase(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(utils, "_ttl_cache_executor",
+            InlineExecutor())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = []
+        for i in range(10):
+            course = Course(department="CMSC", course_number=f"{130 + i}",
+                title=f"Course {i}", is_recent=True)
+            course.save()
+            cls.courses.append(course)
+
+        cls.professors = []
+        for i in range(6):
+            status = (Professor.Status.PENDING if i == 0 else
+                Professor.Status.VERIFIED)
+            professor = Professor.unfiltered.create(name=f"Jon Snow {i}",
+                slug=f"snow{i}", type=Professor.Type.PROFESSOR, status=status)
+            cls.professors.append(professor)
+
+        for i, course in enumerate(cls.courses):
+            for j, professor in enumerate(cls.professors[:3]):
+                ProfessorCourse.objects.create(course=course,
+                    professor=professor, semester_taught=Semester(202108))
+                create_grade(course, professor, 202108, f"010{j}", a=i + j)
+                create_grade(course, professor, 202201, f"010{j}", b=i)
+                Review.unfiltered.create(professor=professor, course=course,
+                    content="review", rating=j + 1, anonymous=True,
+                    status=Review.Status.VERIFIED)
+
+        update_grade_rollups()
+
+
+class CoursesAPITest(APITestCase):
+    def test_average_gpa(self):
+        response = self.client.get(reverse("api-courses"))
+        for data in response.json():
+            course = Course.recent.get(title=data["title"])
+            self.assertEqual(data["average_gpa"], course.average_gpa())
+            self.assertEqual(data["professors"], ["Jon Snow 1", "Jon Snow 2"])
+
+    def test_num_queries(self):
+        # one query for the courses (with their average gpa), one for their
+        # professors, and one for their reviews, no matter how many courses
+        # are returned.
+        with self.assertNumQueries(2):
+            self.client.get(reverse("api-courses"))
+        with self.assertNumQueries(3):
+            self.client.get(reverse("api-courses"), {"reviews": "true"})
+        # plus one for the course's data version
+        with self.assertNumQueries(4):
+            self.client.get(reverse("api-course"),
+                {"name": "CMSC130", "reviews": "true"})
+
+
+class SparseFieldsTest(APITestCase):
+    def test_fields(self):
+        # only the courses are fetched, without their average gpa
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("api-courses"),
+                {"fields": "name,title", "reviews": "true"})
+        self.assertEqual(response.json()[0],
+            {"name": "CMSC130", "title": "Course 0"})
+
+        full = self.client.get(reverse("api-professor"),
+            {"name": "Jon Snow 1"}).json()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("api-professor"),
+                {"name": "Jon Snow 1", "fields": "slug,courses"})
+        self.assertEqual(response.json(),
+            {"slug": full["slug"], "courses": full["courses"]})
+
+        full = self.client.get(reverse("api-grades"),
+            {"course": "CMSC131"}).json()
+        response = self.client.get(reverse("api-grades"),
+            {"course": "CMSC131", "fields": "semester,A+,Other"})
+        self.assertEqual(response.json(), [{"semester": grade["semester"],
+            "A+": grade["A+"], "Other": grade["Other"]} for grade in full])
+
+        response = self.client.get(reverse("api-departments"),
+            {"fields": "department"})
+        self.assertEqual(response.json(), [{"department": "CMSC"}])
+
+        response = self.client.get(reverse("api-courses"),
+            {"fields": "name,average_rating"})
+        self.assertEqual(response.status_code, 400)
+
+
+class GradeValuesTest(APITestCase):
+    def test_identical(self):
+        create_grade(self.courses[0], None, 202108, "0200")
+        grades = Grade.recent.order_by("pk")
+        for fields in [None, ["professor", "semester", "A+"]]:
+            serializer = GradeSerializer(grades, many=True, fields=fields)
+            self.assertEqual(
+                JSONRenderer().render(GradeSerializer.values(grades, fields)),
+                JSONRenderer().render(serializer.data)
+            )
+
+
+class PaginationTest(APITestCase):
+    def crawl(self, url, limit):
+        names = []
+        params = {"cursor": "", "limit": limit}
+        while True:
+            response = self.client.get(url, params)
+            names += [data["name"] for data in response.json()]
+            if "X-Next-Cursor" not in response:
+                return names
+            params["cursor"] = response["X-Next-Cursor"]
+
+    def test_cursor(self):
+        names = self.crawl(reverse("api-courses"), 3)
+        self.assertEqual(names, [course.name for course in self.courses])
+        names = self.crawl(reverse("api-professors"), 2)
+        self.assertEqual(names, [f"Jon Snow {i}" for i in range(1, 6)])
+
+        # offset pagination still works
+        response = self.client.get(reverse("api-courses"),
+            {"offset": 8, "limit": 5})
+        self.assertEqual([data["name"] for data in response.json()],
+            ["CMSC138", "CMSC139"])
+
+        response = self.client.get(reverse("api-courses"), {"cursor": "x"})
+        self.assertEqual(response.status_code, 400)
+        # valid json, but not a valid professor id
+        response = self.client.get(reverse("api-professors"),
+            {"cursor": encode_cursor("abc")})
+        self.assertEqual(response.status_code, 400)
+
+
+class ProfessorsAPITest(APITestCase):
+    def test_average_rating(self):
+        response = self.client.get(reverse("api-professors"))
+        data = response.json()
+        # the pending professor is excluded
+        self.assertEqual(len(data), 5)
+        for professor_data in data:
+            professor = Professor.verified.get(name=professor_data["name"])
+            self.assertEqual(professor_data["average_rating"],
+                professor.average_rating)
+            courses = [course.name for course in professor.course_set.all()]
+            self.assertEqual(professor_data["courses"], courses)
+
+    def test_num_queries(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse("api-professors"))
+        with self.assertNumQueries(3):
+            self.client.get(reverse("api-professors"), {"reviews": "true"})
+        with self.assertNumQueries(3):
+            self.client.get(reverse("api-professor"),
+                {"name": "Jon Snow 1", "reviews": "true"})
+
+
+class BatchAPITest(APITestCase):
+    def test_batch(self):
+        names = "CMSC131,CMSC132,CMSC999"
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("api-course-batch"),
+                {"names": names, "reviews": "true"})
+        data = response.json()
+        self.assertEqual(list(data), ["CMSC131", "CMSC132", "CMSC999"])
+        self.assertIsNone(data["CMSC999"])
+        for name in ["CMSC131", "CMSC132"]:
+            single = self.client.get(reverse("api-course"),
+                {"name": name, "reviews": "true"}).json()
+            self.assertEqual(data[name], single)
+
+        response = self.client.get(reverse("api-professor-batch"),
+            {"names": "Jon Snow 1,Jon Snow 0"})
+        data = response.json()
+        self.assertEqual(data["Jon Snow 1"]["slug"], "snow1")
+        # pending professors aren't found
+        self.assertIsNone(data["Jon Snow 0"])
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("api-grades-batch"),
+                {"courses": "CMSC131,CMSC999", "semester": "202108"})
+        data = response.json()
+        single = self.client.get(reverse("api-grades"),
+            {"course": "CMSC131", "semester": "202108"}).json()
+        self.assertEqual(data, {"CMSC131": single, "CMSC999": None})
+
+        response = self.client.get(reverse("api-grades-batch"),
+            {"courses": "CMSC131", "professors": "Jon Snow 1"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("api-course-batch"),
+            {"names": ",".join(f"CMSC{i}" for i in range(101))})
+        self.assertEqual(response.status_code, 400)
+
+
+class DepartmentGradesTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        def course(department):
+            return Course.unfiltered.create(department=department,
+                course_number="100", title="Course", is_recent=True)
+
+        create_grade(course("MATH"), None, 202108, "0101", a=100, c=7)
+        # too few students
+        create_grade(course("PHYS"), None, 202108, "0101", a=10)
+        # only pass/fail grades, which are excluded
+        create_grade(course("ENGL"), None, 202201, "0101", a=200)
+        PassFailSemester.objects.create(semester=Semester(202201))
+
+    def expected(self):
+        data = []
+        for department in ["CMSC", "MATH"]:
+            grades = (
+                Grade.recent
+                .filter(course__department=department)
+                .exclude_pf()
+            )
+            data.append((department, grades.average_gpa(),
+                grades.num_students()))
+        return data
+
+    def test_department_grades(self):
+        self.assertEqual(queries.department_grades(), self.expected())
+
+    def test_api(self):
+        url = reverse("api-departments")
+        expected = [{"department": department, "average_gpa": average_gpa,
+            "num_students": num_students} for (department, average_gpa,
+            num_students) in self.expected()]
+        self.assertEqual(self.client.get(url).json(), expected)
+
+        response = self.client.get(url, {"fields": "department,num_students"})
+        self.assertEqual(response.json(), [{"department": d["department"],
+            "num_students": d["num_students"]} for d in expected])
+
+
+class SearchTest(APITestCase):
+    def test_search(self):
+        results = queries.search("snow", 10, professors=True, courses=True)
+        # the pending professor is excluded
+        self.assertEqual([p.name for p in results],
+            [f"Jon Snow {i}" for i in range(1, 6)])
+
+        # courses match by name or title
+        results = queries.search("cmsc13", 3, courses=True)
+        self.assertEqual([c.name for c in results],
+            ["CMSC130", "CMSC131", "CMSC132"])
+        results = queries.search("course 5", 10, courses=True)
+        self.assertEqual([c.name for c in results], ["CMSC135"])
+
+    def test_pagination(self):
+        # `num_results` is a count, not an end index
+        results = queries.search("cmsc", 3, offset=3, courses=True)
+        self.assertEqual([c.name for c in results],
+            ["CMSC133", "CMSC134", "CMSC135"])
+
+        response = self.client.get(reverse("api-search"),
+            {"query": "1", "limit": 2, "offset": 1})
+        # professors and courses are paged together, so this skips the only
+        # professor
+        self.assertEqual([result["name"] for result in response.json()],
+            ["CMSC130", "CMSC131"])
+        self.assertEqual(response["X-Total-Count"], "11")
+
+    def test_fuzzy(self):
+        self.assertEqual(queries.search("jon snaw", 10, professors=True), [])
+        results = queries.search("jon snaw", 10, professors=True, fuzzy=True)
+        self.assertEqual([p.name for p in results],
+            [f"Jon Snow {i}" for i in range(1, 6)])
+
+        # exact matches aren't repeated
+        response = self.client.get(reverse("api-search"),
+            {"query": "snow 2", "fuzzy": "true"})
+        names = [result["name"] for result in response.json()]
+        self.assertEqual(names, ["Jon Snow 2"])
+
+
+class FulltextSearchTest(APITestCase):
+    @staticmethod
+    def match(model, columns, search):
+        # sqlite has no MATCH, so score a description repeating the search
+        # higher than the name itself, as MATCH would
+        return Case(
+            When(name__iexact=search, then=1.0),
+            When(description__icontains=search, then=5.0),
+            default=0.0,
+            output_field=FloatField()
+        )
+
+    def test_exact_name_first(self):
+        Course.unfiltered.create(department="CMSC", course_number="200",
+            title="Course", description="After CMSC131. Unlike CMSC131, ...",
+            is_recent=True)
+        backend = FulltextSearchBackend()
+        with mock.patch.object(FulltextSearchBackend, "_match",
+            staticmethod(self.match)):
+            courses = backend.courses("cmsc131")
+            self.assertEqual([c.name for c in courses], ["CMSC131", "CMSC200"])
+
+
+class SearchCacheTest(APITestCase):
+    def test_cache(self):
+        queries.search("CMSC13", 5, courses=True)
+        # the catalog's version was read by the first search
+        with self.assertNumQueries(0):
+            results = queries.search("cmsc13", 5, courses=True)
+        self.assertEqual(len(results), 5)
+
+        # until the catalog changes
+        results = queries.search("cmsc1", 1, courses=True)
+        self.assertEqual([c.name for c in results], ["CMSC130"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Course(department="CMSC", course_number="129", title="Course",
+                is_recent=True).save()
+        # the stale results are served while they're recomputed
+        results = queries.search("cmsc1", 1, courses=True)
+        self.assertEqual([c.name for c in results], ["CMSC130"])
+        results = queries.search("cmsc1", 1, courses=True)
+        self.assertEqual([c.name for c in results], ["CMSC129"])
+
+
+class AutocompleteTest(APITestCase):
+    def autocomplete(self, query):
+        response = self.client.get(reverse("autocomplete"), {"query": query,
+            "types[]": ["professor", "course"], "return_attrs[]": ["name"]})
+        return [result["label"] for result in response.json()]
+
+    def test_ranking(self):
+        # an exact match, then matches at the start, then anywhere else
+        self.assertEqual(self.autocomplete("cmsc131"), ["CMSC131"])
+        self.assertEqual(self.autocomplete("course 1"), ["CMSC131"])
+        self.assertEqual(self.autocomplete("snow 3"), ["Jon Snow 3"])
+        self.assertEqual(self.autocomplete("1")[:3],
+            ["Jon Snow 1", "CMSC130", "CMSC131"])
+
+    def test_catalog_changes(self):
+        self.autocomplete("cmsc")
+        with self.captureOnCommitCallbacks(execute=True):
+            ProfessorAlias.objects.create(alias="Ned Stark",
+                professor=self.professors[2])
+        # the stale index is used while it's rebuilt
+        self.assertEqual(self.autocomplete("stark"), [])
+        self.assertEqual(self.autocomplete("stark"), ["Jon Snow 2"])
+        # answered from the index, without touching the database
+        with self.assertNumQueries(0):
+            self.autocomplete("stark")
+
+
+class FindSimilarTest(APITestCase):
+    def test_find_similar(self):
+        similar = Professor.find_similar("Jon Snaw 3", 85)
+        self.assertEqual(similar[0].name, "Jon Snow 3")
+        # the pending professor is excluded
+        self.assertNotIn(self.professors[0], similar)
+        self.assertEqual(Professor.find_similar("Daenerys", 70), [])
+
+    def test_no_common_trigrams(self):
+        # a `fuzz.ratio` of 73, without a trigram in common
+        index = SimilarNameIndex([("short", "abcd"), ("long", "abcdefghijk")])
+        self.assertEqual(index.find("axbxcxd", 70), ["short"])
+
+    def test_updates(self):
+        Professor.find_similar("Jon Snow", 70)
+        (pending, verified) = (self.professors[0], self.professors[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            pending.status = Professor.Status.VERIFIED
+            pending.save()
+            verified.name = "Daenerys Targaryen"
+            verified.save()
+        # updated in place, without rebuilding the index
+        with self.assertNumQueries(0):
+            self.assertIn(pending, Professor.find_similar("Jon Snaw 0", 85))
+            self.assertEqual(Professor.find_similar("Daenerys Targaryn", 85),
+                [verified])
+            self.assertNotIn(verified, Professor.find_similar("Jon Snow 1",
+                85))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            verified.delete()
+        self.assertEqual(Professor.find_similar("Daenerys Targaryn", 85), [])
+
+
+class CacheInvalidationTest(APITestCase):
+    def test_grade_data(self):
+        def num_students(course):
+            response = self.client.get(reverse("grade-data"),
+                {"course": course})
+            return response.json()["num_students"]
+
+        before = (num_students("CMSC130"), num_students("CMSC131"))
+        create_grade(self.courses[0], self.professors[1], 202108, "0200", a=5)
+        # only the course with the new grade changes, and as soon as its stale
+        # data has been recomputed
+        self.assertEqual(num_students("CMSC130"), before[0])
+        self.assertEqual(num_students("CMSC130"), before[0] + 19)
+        self.assertEqual(num_students("CMSC131"), before[1])
+
+
+    def test_catalog_batches(self):
+        def version():
+            return DataVersion.versions(["catalog"])[0]
+
+        before = version()
+        with self.captureOnCommitCallbacks(execute=True):
+            for number in ["127", "128"]:
+                Course.unfiltered.create(department="CMSC",
+                    course_number=number, title="Course")
+        # once per transaction, not once per course
+        self.assertEqual(version(), before + 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with batch_invalidations():
+                self.courses[0].delete()
+                self.assertEqual(version(), before + 1)
+                self.courses[1].delete()
+        self.assertEqual(version(), before + 2)
+
+
+class PassFailSemesterTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # the pass/fail semesters added by migration 0013, when migrations run
+        PassFailSemester.objects.all().delete()
+
+    def num_students(self, course, **params):
+        response = self.client.get(reverse("grade-data"),
+            {"course": course, **params})
+        return response.json()["num_students"]
+
+    def test_pf_semesters(self):
+        url = reverse("pf-semesters-data")
+        self.assertEqual(pf_semesters(), [])
+        self.assertEqual(self.client.get(url).json(), {"data": []})
+
+        PassFailSemester.objects.create(semester=Semester(202201))
+        # seen once the stale value is recomputed, not once the cache expires
+        self.assertEqual(pf_semesters(), [])
+        self.assertEqual(pf_semesters(), [Semester(202201)])
+        self.assertEqual(self.client.get(url).json(), {"data": ["202201"]})
+
+        # rendered into the page, so a search never runs before they're known
+        response = self.client.get(reverse("grades"))
+        self.assertContains(response, '<script id="pf-semesters" '
+            'type="application/json">["202201"]</script>', html=True)
+
+    def test_exclude_pf(self):
+        grades = Grade.recent.filter(course=self.courses[1])
+        before = self.num_students("CMSC131")
+        self.assertEqual(before, grades.num_students())
+
+        PassFailSemester.objects.create(semester=Semester(202201))
+        # the cached statistics were invalidated, so after one stale response
+        # they're recomputed
+        self.num_students("CMSC131")
+        self.assertEqual(self.num_students("CMSC131"),
+            grades.exclude(semester=Semester(202201)).num_students())
+        self.assertEqual(self.num_students("CMSC131", pf_semesters="true"),
+            before)
+
+
+@skipIf(np is None, "numpy is not installed")
+class GradeMatrixTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        math = Course.unfiltered.create(department="MATH", course_number="140",
+            title="Calculus I", is_recent=True)
+        # uneven totals, so the average gpas aren't round numbers, including
+        # grades without a professor and from a pass/fail semester
+        for (i, course) in enumerate([math, *cls.courses[:3]]):
+            create_grade(course, None, 202008, "0101", a_minus=i + 2,
+                b_plus=3, c_minus=7, d_minus=i, w=2)
+            create_grade(course, cls.professors[2], 202001, "0102",
+                a=i, b_minus=5, d_plus=i + 4, f=3, other=2)
+        # migration 0013 already adds it, when migrations run
+        PassFailSemester.objects.get_or_create(semester=Semester(202001))
+
+    def setUp(self):
+        super().setUp()
+        self.matrix = GradeMatrix.load()
+
+    # the orm queries `GradeData._grade_data` falls back to
+    def grades(self, *, exclude_pf, professor=None, course=None,
+        semester=None, section=None):
+        grades = Grade.recent.all()
+        if professor:
+            professor = Professor.verified.filter(slug=professor).first()
+            grades = grades.filter(professor=professor)
+        if course:
+            grades = grades.filter(course__name=course)
+        if semester:
+            grades = grades.filter(semester=semester)
+        if section:
+            grades = grades.filter(section=section)
+        if exclude_pf:
+            grades = grades.exclude_pf()
+        return grades
+
+    def test_aggregate(self):
+        filters = [
+            {},
+            {"course": "MATH140"},
+            {"course": "CMSC131", "section": "0101"},
+            {"professor": "snow2"},
+            # grades without a professor
+            {"professor": "nobody"},
+            {"professor": "snow2", "semester": Semester(202001)},
+            {"course": "CMSC139", "semester": Semester(202008)}
+        ]
+        for exclude_pf in [False, True]:
+            for filters_ in filters:
+                with self.subTest(exclude_pf=exclude_pf, **filters_):
+                    grades = self.grades(exclude_pf=exclude_pf, **filters_)
+                    expected = {
+                        "average_gpa": grades.average_gpa(),
+                        "num_students": grades.num_students(),
+                        **grades.grade_totals_aggregate()
+                    }
+                    self.assertEqual(self.matrix.aggregate(recent=True,
+                        exclude_pf=exclude_pf, **filters_), expected)
+
+    def test_grade_data_by(self):
+        queries = [
+            ("course__name", {}, Grade.recent.all()),
+            ("course__department", {}, Grade.recent.all()),
+            ("semester", {}, Grade.recent.all()),
+            ("semester", {"department": "cmsc"},
+                Grade.recent.filter(course__department="CMSC")),
+            ("course__name", {"course_contains": "13"},
+                Grade.recent.filter(course__name__icontains="13"))
+        ]
+        for exclude_pf in [False, True]:
+            for (field, filters, grades) in queries:
+                with self.subTest(field, exclude_pf=exclude_pf, **filters):
+                    if exclude_pf:
+                        grades = grades.exclude_pf()
+                    self.assertEqual(self.matrix.grade_data_by(field,
+                        recent=True, exclude_pf=exclude_pf, **filters),
+                        grades.grade_data_by(field))
+
+
+class GradeRollupTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        PassFailSemester.objects.create(semester=Semester(202201))
+
+    def statistics(self, grades):
+        return (grades.average_gpa(), grades.num_students(),
+            grades.grade_totals_aggregate())
+
+    # the same statistics, always computed from the raw grades
+    def raw_statistics(self, grades):
+        return (
+            grades._apply_average_gpa(grades.aggregate)["average_gpa"],
+            grades.aggregate(num_students=Sum("num_students"))["num_students"],
+            grades.aggregate(**grades._grade_totals())
+        )
+
+    def test_rollups(self):
+        (course, professor) = (self.courses[1], self.professors[2])
+        querysets = [
+            Grade.recent.all(),
+            Grade.recent.filter(course=course),
+            Grade.recent.filter(professor=professor),
+            Grade.recent.filter(course__department="CMSC"),
+            Grade.unfiltered.filter(semester=Semester(202108)),
+            Grade.recent.filter(course=course, professor=professor),
+            Grade.unfiltered.filter(course__department="CMSC",
+                semester__gte=Semester(202201)),
+            # only pass/fail grades, which are all excluded
+            Grade.unfiltered.filter(semester=Semester(202201))
+        ]
+        for exclude_pf in [False, True]:
+            for grades in querysets:
+                if exclude_pf:
+                    grades = grades.exclude_pf()
+                with self.subTest(str(grades.query)):
+                    self.assertIsNotNone(grades._rollup())
+                    self.assertEqual(self.statistics(grades),
+                        self.raw_statistics(grades))
+
+    def test_fallback(self):
+        querysets = [
+            Grade.recent.filter(section="0101"),
+            Grade.recent.filter(course__name="CMSC131"),
+            Grade.recent.filter(professor=None),
+            Grade.recent.filter(course=self.courses[1]).exclude(
+                professor=self.professors[1], semester=Semester(202108))
+        ]
+        for exclude_pf in [False, True]:
+            for grades in querysets:
+                if exclude_pf:
+                    grades = grades.exclude_pf()
+                with self.subTest(str(grades.query)):
+                    self.assertIsNone(grades._rollup())
+                    self.assertEqual(self.statistics(grades),
+                        self.raw_statistics(grades))
+                    self.assertEqual(grades.num_students(),
+                        sum(grade.num_students for grade in grades) or None)
+
+
+class GradeRollupSignalTest(APITestCase):
+    def rollups(self):
+        # the rows of each rollup table, without their ids
+        return [[{k: v for (k, v) in row.items() if k != "id"}
+            for row in rollup.objects.values()] for rollup in GRADE_ROLLUPS]
+
+    def assertRollupsRebuilt(self):
+        rollups = self.rollups()
+        update_grade_rollups()
+        for (table, rebuilt) in zip(rollups, self.rollups()):
+            self.assertCountEqual(table, rebuilt)
+
+    def test_move(self):
+        grade = Grade.unfiltered.get(course=self.courses[0],
+            semester=Semester(202108), section="0100")
+        # to another semester, and from a professor to no professor
+        grade.semester = Semester(202008)
+        grade.professor = None
+        with self.captureOnCommitCallbacks(execute=True):
+            grade.save()
+        self.assertRollupsRebuilt()
+
+    def test_cascade(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.professors[1].delete()
+            self.courses[0].delete()
+        # every deleted grade queues a flush, but only the first does anything
+        self.assertGreater(len(callbacks), 1)
+        self.assertRollupsRebuilt()
+
+
+class CourseGradeDataTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # a course this professor only taught in a pass/fail semester
+        course = Course.unfiltered.create(department="MATH",
+            course_number="140", title="Calculus I", is_recent=True)
+        ProfessorCourse.objects.create(course=course,
+            professor=cls.professors[1], semester_taught=Semester(202201))
+        create_grade(course, cls.professors[1], 202201, "0101", a=3)
+        # a course taught in two semesters, which has a `ProfessorCourse` for
+        # each
+        ProfessorCourse.objects.create(course=cls.courses[0],
+            professor=cls.professors[1], semester_taught=Semester(202201))
+        PassFailSemester.objects.create(semester=Semester(202201))
+
+    # `compose_course_grade_data` with three aggregate queries per course
+    def course_grade_data(self, professor, include_pf):
+        grades = professor.grade_set(manager="recent").all()
+        if not include_pf:
+            grades = grades.exclude_pf()
+        data = {
+            "professor_slug": professor.slug,
+            "average_gpa": grades.average_gpa(),
+            "num_students": grades.num_students(),
+            "data": {}
+        }
+        for course in professor.course_set.order_by("name").distinct():
+            course_grades = grades.filter(course=course)
+            average_gpa = course_grades.average_gpa()
+            num_students = course_grades.num_students()
+            if num_students and average_gpa:
+                data["data"][course.name] = GradeData._get_data(average_gpa,
+                    num_students, course_grades.grade_totals_aggregate())
+        return data
+
+    def test_compose_course_grade_data(self):
+        professor = self.professors[1]
+        for include_pf in [False, True]:
+            with self.subTest(include_pf=include_pf):
+                data = GradeData.compose_course_grade_data(professor.name,
+                    include_pf)
+                self.assertEqual(data,
+                    self.course_grade_data(professor, include_pf))
+                self.assertEqual("MATH140" in data["data"], include_pf)
+
+        response = self.client.get(reverse("grade-data"),
+            {"professor": professor.name, "professor_courses": "true"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("CMSC130", response.json()["data"])
+
+
+class ConditionalGetTest(APITestCase):
+    def test_not_modified(self):
+        url = reverse("api-grades")
+        params = {"course": "CMSC130"}
+        response = self.client.get(url, params)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        # answered from the data version alone
+        with self.assertNumQueries(1):
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # a review doesn't change the course's grades
+        Review.unfiltered.create(professor=self.professors[1],
+            course=self.courses[0], content="review", rating=5,
+            anonymous=True, status=Review.Status.VERIFIED)
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        create_grade(self.courses[0], self.professors[1], 202108, "0200")
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        # other courses are unaffected
+        params = {"course": "CMSC131"}
+        etag = self.client.get(url, params)["ETag"]
+        create_grade(self.courses[0], self.professors[1], 202108, "0201")
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class CourseDifficultyDataTest(APITestCase):
+    def test_content_encoding(self):
+        url = reverse("course-difficulty-data", args=["departments"])
+        response = self.client.get(url)
+        self.assertNotIn("Content-Encoding", response)
+        data = json.loads(response.content)
+        self.assertIn("CMSC", data["data"][0][0])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(json.loads(gzip.decompress(response.content)), data)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertNotIn("Content-Encoding", response)
+
+
+class TTLCacheTest(CacheTestCase):
+    def test_max_entries(self):
+        calls = []
+        @ttl_cache(60, max_entries=2)
+        def square(n):
+            calls.append(n)
+            return n * n
+
+        square(1)
+        square(2)
+        # 1 is now the most recently used, so 2 is evicted instead
+        self.assertEqual(square(1), 1)
+        square(3)
+        self.assertEqual(square(1), 1)
+        self.assertEqual(square(2), 4)
+        self.assertEqual(calls, [1, 2, 3, 2])
+
+        cache = square.cache
+        self.assertEqual(len(cache.entries), 2)
+        self.assertEqual(cache.evictions, 2)
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_max_bytes(self):
+        @ttl_cache(60, max_bytes=10_000)
+        def data(n):
+            return "x" * n
+
+        data(4000)
+        data(4001)
+        self.assertEqual(len(data.cache.entries), 2)
+        data(4002)
+        self.assertEqual(len(data.cache.entries), 2)
+        self.assertLessEqual(data.cache.size, 10_000)
+        # larger than the whole budget, so never cached
+        data(20_000)
+        self.assertEqual(len(data.cache.entries), 2)
+
+    def test_single_flight(self):
+        started = Event()
+        release = Event()
+        calls = []
+        @ttl_cache(60)
+        def slow():
+            calls.append(None)
+            if len(calls) > 1:
+                started.set()
+                release.wait(5)
+            return len(calls)
+
+        self.assertEqual(slow(), 1)
+        slow.cache.expire()
+        # every stale call is served the old value, but only the first starts
+        # a recomputation
+        for _ in range(5):
+            self.assertEqual(slow(), 1)
+        started.wait(5)
+        release.set()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(slow.cache.skipped_refreshes, 4)
+
+    @override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+        "ttl_cache": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    })
+    def test_shared(self):
+        calls = []
+        # two copies of the same function, as if in two worker processes
+        def make_function():
+            @ttl_cache(60)
+            def count():
+                calls.append(None)
+                return len(calls)
+            return count
+        (count_1, count_2) = (make_function(), make_function())
+
+        self.assertEqual(count_1(), 1)
+        self.assertEqual(count_2(), 1)
+        self.assertEqual(len(calls), 1)
+
+        recompute_ttl_cache()
+        # the stale value is returned while it is recomputed
+        self.assertEqual(count_2(), 1)
+        for _ in range(100):
+            if count_1() == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(count_1(), 2)
+        self.assertEqual(len(calls), 2)
+
+    def test_tags(self):
+        calls = []
+        @ttl_cache(60, tags=lambda n: [cache_tag("square", n)])
+        def square(n):
+            calls.append(n)
+            return n * n
+
+        square(1)
+        square(2)
+        invalidate_ttl_cache(cache_tag("square", 1))
+        # the stale value is returned while it is recomputed
+        self.assertEqual(square(1), 1)
+        square(2)
+        for _ in range(100):
+            if len(calls) == 3:
+                break
+            time.sleep(0.01)
+        self.assertEqual(calls, [1, 2, 1])
+
+    def test_nested(self):
+        versions = {"inner": 1}
+        @ttl_cache(60, tags=["inner"])
+        def inner():
+            return versions["inner"]
+        @ttl_cache(60, tags=["inner", "outer"])
+        def outer():
+            return inner()
+
+        self.assertEqual(outer(), 1)
+        versions["inner"] = 2
+        invalidate_ttl_cache("inner")
+        with mock.patch.object(utils, "_ttl_cache_executor", InlineExecutor()):
+            self.assertEqual(outer(), 1)
+        # recomputing `outer` didn't use the stale value of `inner`
+        self.assertEqual(outer(), 2)
+
+
+class CrossProcessInvalidationTest(TransactionTestCase):
+    def setUp(self):
+        if (connection.vendor == "sqlite" and
+            connection.creation.is_in_memory_db(connection.settings_dict["NAME"])):
+            self.skipTest("other processes can't see an in-memory database")
+
+    def test_invalidate(self):
+        calls = []
+        @ttl_cache(60, shared=False, tags=["catalog"])
+        def num_calls():
+            calls.append(None)
+            return len(calls)
+
+        self.assertEqual(num_calls(), 1)
+        self.assertEqual(num_calls(), 1)
+
+        # as `updatecourses` or the admin panel in another worker would
+        code = (
+            "from django.db import connection\n"
+            f"connection.settings_dict['NAME'] = "
+            f"{connection.settings_dict['NAME']!r}\n"
+            "from home.models import invalidate_tags\n"
+            "invalidate_tags('catalog')"
+        )
+        subprocess.run([sys.executable, "manage.py", "shell", "-c", code],
+            cwd=settings.BASE_DIR, check=True)
+        # as if `TAG_VERSION_INTERVAL` had passed
+        with mock.patch.object(utils, "TAG_VERSION_INTERVAL", 0):
+            # the stale value is returned while it is recomputed
+            self.assertEqual(num_calls(), 1)
+            for _ in range(100):
+                if num_calls() == 2:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(num_calls(), 2)
+
+
+class PageCacheTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        # data versions restart with every test, so fragments cached by an
+        # earlier test could otherwise look current.
+        cache.clear()
+
+    def test_professor(self):
+        url = reverse("professor", args=[self.professors[1].slug])
+        self.client.get(url)
+        # only the professor, the review form's courses, and the data versions
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, "Jon Snow 1")
+
+        Review.unfiltered.create(professor=self.professors[1],
+            course=self.courses[0], content="a new review", rating=5,
+            anonymous=True, status=Review.Status.VERIFIED)
+        self.assertContains(self.client.get(url), "a new review")
+
+    def test_course(self):
+        url = reverse("course", args=["CMSC130"])
+        self.client.get(url)
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+        # the course page shows each professor's average rating over all their
+        # reviews, not just this course's
+        before = self.client.get(url).content
+        Review.unfiltered.create(professor=self.professors[1],
+            course=self.courses[1], content="review", rating=5,
+            anonymous=True, status=Review.Status.VERIFIED)
+        self.assertNotEqual(self.client.get(url).content, before)
@@ -1,22 +1,39 @@
 from enum import Enum, auto
 from functools import wraps, total_ordering
 import time
+import sys
+import pickle
+import hashlib
+import json
+import gzip
 import base64
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from threading import Thread
+from threading import Thread, Lock, local
+from concurrent.futures import ThreadPoolExecutor
+import traceback
+from collections import OrderedDict
 from datetime import datetime
 
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
 from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
 from django.template.defaultfilters import pluralize
+from django.utils.safestring import mark_safe
 
 from discord_webhook import DiscordWebhook
 from discord_webhook.webhook import DiscordEmbed
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
-from home.models import Professor
+from home.models import Professor, DataVersion
 
+from planetterp import config
 from planetterp.config import (WEBHOOK_URL_UPDATE, EMAIL_HOST_USER,
     EMAIL_SERVICE_ACCOUNT_CREDENTIALS, WEBHOOK_FREQUENCY)
 
@@ -106,10 +123,6 @@ class Semester:
     def number(self):
         return int(f"{self.year}{self.season_number:02}")
 
-# If you add additional semesters here, you will also need to add additional
-# semesters to grades.html in the submitCourseSearch method.
-PF_SEMESTERS = [Semester(202001), Semester(202101)]
-
 class AdminAction(Enum):
     # Review actions
     REVIEW_VERIFY = "review_verify"
@@ -139,11 +152,415 @@ class ReviewsTableColumn(Enum):
 # * we want to be able to force update values, even if the ttl hasn't expired
 #   yet. This is useful for scenarios where we eg add new grades and want to
 #   update all grade graphs immediately.
-# XXX: as we've handrolled our own (unbounded) cache implementation, this has
-# the potential to cause memory leaks. Investigate this first if memory leaks
-# arise in the future.
-_ttl_cache = {}
-def ttl_cache(max_age):
+# Each decorated function gets its own `TTLCache`, which is bounded by both a
+# number of entries and an (approximate) number of bytes. Once either is
+# exceeded, the least recently used entries are evicted. Every decorated
+# function's cache is registered in `ttl_caches` so we can report on and
+# invalidate all of them.
+#
+# With multiple worker processes, each would otherwise compute every value
+# itself, so the caches can instead be stored in a django cache shared by all
+# processes (`TTL_CACHE_BACKEND` in config.py). Either way, invalidating a tag
+# reaches every process: the tag versions are kept in the shared cache if there
+# is one, and are the tags' `DataVersion`s otherwise, which each process only
+# rereads every few seconds (see `TagVersions`).
+ttl_caches = []
+GENERATION_KEY = "ttl_cache:generation"
+# how long, in seconds, other processes wait for a recomputation of a shared
+# entry before starting their own.
+REFRESH_TIMEOUT = 10 * 60
+# how long, in seconds, a process trusts the data versions it has read, when
+# the ttl caches aren't shared. This is how long other processes take to see an
+# invalidation.
+TAG_VERSION_INTERVAL = 5
+# the most tags whose versions a process remembers. Tags are built from user
+# input, so there's no other bound on them.
+MAX_TAG_VERSIONS = 100_000
+# stale entries are recomputed on this pool, so a burst of expirations can't
+# start an unbounded number of heavy queries at once.
+_ttl_cache_executor = ThreadPoolExecutor(
+    max_workers=getattr(config, "TTL_CACHE_WORKERS", 4),
+    thread_name_prefix="ttl_cache")
+# how many ttl cached values this thread is computing, nested in each other.
+_computing = local()
+
+class TagVersions:
+    """
+    This process's copy of the `DataVersion`s of ttl cache tags, for when the
+    ttl caches aren't shared. A tag's version is read from the database at most
+    once every `TAG_VERSION_INTERVAL` seconds, so a cache hit doesn't cost a
+    query. Tags invalidated by this process are reread on their next use.
+    """
+    def __init__(self):
+        # tag -> (version, time it was read), least recently read first
+        self.versions = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, tags):
+        """
+        The versions of `tags`, in the same order.
+        """
+        now = time.monotonic()
+        versions = {}
+        outdated = []
+        with self.lock:
+            for tag in tags:
+                (version, read_at) = self.versions.get(tag, (None, None))
+                if read_at is None or now - read_at >= TAG_VERSION_INTERVAL:
+                    outdated.append(tag)
+                else:
+                    versions[tag] = version
+
+        if outdated:
+            read = dict(zip(outdated, DataVersion.versions(outdated)))
+            versions.update(read)
+            with self.lock:
+                for (tag, version) in read.items():
+                    self.versions.pop(tag, None)
+                    self.versions[tag] = (version, now)
+                while len(self.versions) > MAX_TAG_VERSIONS:
+                    self.versions.popitem(last=False)
+        return tuple(versions[tag] for tag in tags)
+
+    def expire(self, tags):
+        with self.lock:
+            for tag in tags:
+                self.versions.pop(tag, None)
+
+    def clear(self):
+        with self.lock:
+            self.versions.clear()
+
+tag_versions = TagVersions()
+
+class TTLCache:
+    """
+    The cache behind a single `ttl_cache`-decorated function.
+
+    Entries are `(time_salt, (generation, tag_versions), value)`. An entry is
+    stale once its time salt is older than the current one, once
+    `recompute_ttl_cache` has bumped the generation past its own, or once any
+    of its tags was invalidated since it was computed (see
+    `invalidate_ttl_cache`). Stale entries are still returned while they're
+    recomputed, except to the computation of another ttl cached value, which
+    recomputes them on its own thread instead.
+
+    If the "ttl_cache" cache is configured and `shared` is true, entries are
+    pickled and stored there, so every worker process sees the same values.
+    Otherwise they're kept in `entries`, in least recently used order, as
+    `key -> (time_salt, versions, value, size)`. All access to `entries` and
+    `refreshing` must hold `lock`, since stale entries are recomputed on
+    separate threads.
+    """
+    def __init__(self, function, max_age, max_entries, max_bytes, shared,
+        tags):
+        self.function = function
+        self.tags = tags
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.shared = shared
+
+        self.entries = OrderedDict()
+        # keys which are currently being recomputed
+        self.refreshing = set()
+        self.lock = Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # stale hits which didn't start a recomputation because one was
+        # already running for that key
+        self.skipped_refreshes = 0
+
+    def __repr__(self):
+        return f"<TTLCache {self.name} ({len(self.entries)} entries)>"
+
+    @property
+    def name(self):
+        return f"{self.function.__module__}.{self.function.__qualname__}"
+
+    @property
+    def hit_rate(self):
+        calls = self.hits + self.misses
+        return None if calls == 0 else self.hits / calls
+
+    @property
+    def backend(self):
+        """
+        The django cache this function's entries are stored in, or `None` if
+        they are stored in this process.
+        """
+        return shared_ttl_cache() if self.shared else None
+
+    def shared_key(self, key):
+        # `hash` is randomized per process, so we can't use it here.
+        digest = hashlib.sha1(pickle.dumps(key)).hexdigest()
+        return f"ttl_cache:{self.name}:{digest}"
+
+    def get(self, args, kwargs):
+        (key, time_salt, versions, entry) = self.lookup(args, kwargs)
+
+        if entry is None:
+            with self.lock:
+                self.misses += 1
+            value = self.compute(args, kwargs)
+            self.store(key, time_salt, versions, value)
+            return value
+
+        with self.lock:
+            self.hits += 1
+
+        if self.is_stale(entry, time_salt, versions):
+            if getattr(_computing, "depth", 0):
+                # we're computing a value which depends on this one, and which
+                # will be cached as up to date, so it can't use a stale value.
+                value = self.compute(args, kwargs)
+                self.store(key, time_salt, versions, value)
+                return value
+            # recompute the new value in a separate thread, but return the
+            # cached value immediately so we don't delay the response.
+            self.refresh(key, time_salt, versions, args, kwargs)
+
+        return entry[2]
+
+    def compute(self, args, kwargs):
+        _computing.depth = getattr(_computing, "depth", 0) + 1
+        try:
+            return self.function(*args, **kwargs)
+        finally:
+            _computing.depth -= 1
+
+    def warm(self, args, kwargs):
+        """
+        Computes and caches the result for `args` and `kwargs` on this thread,
+        unless an up to date result is already cached. Returns whether the
+        result was computed.
+        """
+        (key, time_salt, versions, entry) = self.lookup(args, kwargs)
+        if entry is not None and not self.is_stale(entry, time_salt, versions):
+            return False
+
+        value = self.compute(args, kwargs)
+        self.store(key, time_salt, versions, value)
+        return True
+
+    def lookup(self, args, kwargs):
+        """
+        Returns `(key, time_salt, versions, entry)` for a call with `args` and
+        `kwargs`, where `entry` is `None` if nothing is cached for them.
+        """
+        time_salt = time.time() // self.max_age
+        key = self.key(args, kwargs)
+        tags = self.tags
+        if callable(tags):
+            tags = tags(*args, **kwargs)
+        tags = tuple(tags or ())
+        (entry, versions) = self.load(key, tags)
+        return (key, time_salt, versions, entry)
+
+    @staticmethod
+    def key(args, kwargs):
+        # make kwargs hashable
+        return (args, tuple(sorted(kwargs.items())))
+
+    def peek(self, args, kwargs):
+        """
+        The value cached in this process for `args` and `kwargs`, stale or
+        not, or `None` if there isn't one. Never computes anything.
+        """
+        entry = self.load_local(self.key(args, kwargs))
+        return None if entry is None else entry[2]
+
+    @staticmethod
+    def is_stale(entry, time_salt, versions):
+        (time_salt_cached, (generation_cached, tag_versions_cached),
+            _value) = entry
+        # tag versions only need to differ, not increase (see
+        # `invalidate_ttl_cache`).
+        return (time_salt_cached < time_salt or
+            generation_cached < versions[0] or
+            tag_versions_cached != versions[1])
+
+    def load(self, key, tags):
+        """
+        Returns `(entry, versions)`, where `entry` is `None` if `key` isn't
+        cached, and `versions` is the current `(generation, tag_versions)` for
+        `tags`.
+        """
+        backend = shared_ttl_cache()
+        if backend is None:
+            versions = (0, tag_versions.get(tags))
+            return (self.load_local(key), versions)
+
+        version_keys = [GENERATION_KEY, *[tag_key(tag) for tag in tags]]
+        if not self.shared:
+            values = backend.get_many(version_keys)
+            entry = self.load_local(key)
+        else:
+            shared_key = self.shared_key(key)
+            # fetch the entry and its versions in a single round trip
+            values = backend.get_many([shared_key, *version_keys])
+            entry = values.get(shared_key)
+            if entry is not None:
+                entry = pickle.loads(entry)
+
+        versions = tuple(values.get(version_key, 0)
+            for version_key in version_keys[1:])
+        return (entry, (values.get(GENERATION_KEY, 0), versions))
+
+    def load_local(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[:3]
+
+    def refresh(self, key, time_salt, versions, args, kwargs):
+        """
+        Recomputes `key` on the ttl cache's worker pool, unless it is already
+        being recomputed, by this or (for shared entries) any other process.
+        """
+        with self.lock:
+            if key in self.refreshing:
+                self.skipped_refreshes += 1
+                return
+            self.refreshing.add(key)
+
+        backend = self.backend
+        if backend is not None:
+            lock_key = f"{self.shared_key(key)}:refreshing"
+            # `add` is atomic, so only one process gets to recompute. The
+            # timeout guards against a process dying mid-recomputation.
+            if not backend.add(lock_key, True, timeout=REFRESH_TIMEOUT):
+                with self.lock:
+                    self.refreshing.discard(key)
+                    self.skipped_refreshes += 1
+                return
+
+        def recompute():
+            try:
+                value = self.compute(args, kwargs)
+                self.store(key, time_salt, versions, value)
+            except Exception:
+                # the executor would otherwise swallow this silently. The
+                # stale value stays cached, so the next call will try again.
+                traceback.print_exc()
+            finally:
+                if backend is not None:
+                    backend.delete(lock_key)
+                with self.lock:
+                    self.refreshing.discard(key)
+        _ttl_cache_executor.submit(recompute)
+
+    def store(self, key, time_salt, versions, value):
+        backend = self.backend
+        if backend is not None:
+            entry = pickle.dumps((time_salt, versions, value),
+                pickle.HIGHEST_PROTOCOL)
+            # stale entries are still served while they're recomputed, so
+            # never expire them. The backend's own culling bounds its size.
+            backend.set(self.shared_key(key), entry, timeout=None)
+            return
+
+        # computing the size can be slow for large values, so do it before we
+        # take the lock.
+        size = sizeof(value)
+
+        with self.lock:
+            if key in self.entries:
+                old_size = self.entries.pop(key)[3]
+                self.size -= old_size
+
+            # a value larger than the entire budget would only evict
+            # everything else and then itself, so don't bother caching it.
+            if self.max_bytes is not None and size > self.max_bytes:
+                self.evictions += 1
+                return
+
+            self.entries[key] = (time_salt, versions, value, size)
+            self.size += size
+
+            while (
+                (self.max_entries is not None and
+                    len(self.entries) > self.max_entries) or
+                (self.max_bytes is not None and self.size > self.max_bytes)
+            ):
+                (_key, entry) = self.entries.popitem(last=False)
+                self.size -= entry[3]
+                self.evictions += 1
+
+    def expire(self):
+        """
+        Marks every entry in this process as stale, so it will be recomputed on
+        its next call.
+        """
+        with self.lock:
+            for key, (_time_salt, *entry) in self.entries.items():
+                # set time_salt to 0 to force recomputation on next call
+                self.entries[key] = (0, *entry)
+
+    def clear(self):
+        """
+        Drops every entry cached in this process.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def items(self):
+        """
+        A snapshot of `(key, time_salt, value)` for every entry in this process,
+        from least to most recently used.
+        """
+        with self.lock:
+            return [(key, time_salt, value) for key, (time_salt, _versions,
+                value, _size) in self.entries.items()]
+
+
+def shared_ttl_cache():
+    """
+    The django cache shared by every process's ttl caches, or `None` if
+    `TTL_CACHE_BACKEND` isn't configured.
+    """
+    if "ttl_cache" not in settings.CACHES:
+        return None
+    return caches["ttl_cache"]
+
+def tag_key(tag):
+    # tags can contain spaces (eg professor names), which some backends don't
+    # allow in keys.
+    digest = hashlib.sha1(tag.encode()).hexdigest()
+    return f"ttl_cache:tag:{digest}"
+
+def cache_tag(*parts):
+    """
+    The ttl cache tag made up of `parts`, eg `cache_tag("grade", "course",
+    "CMSC131")` is "grade:course:cmsc131". Tags are case-insensitive, like our
+    database's collation, since they're often built from user input.
+    """
+    return ":".join(str(part).lower() for part in parts)
+
+def invalidate_ttl_cache(*tags):
+    """
+    Marks every ttl cache entry with any of `tags` as stale, in every process,
+    so it is recomputed on its next call. Also bumps the tags' `DataVersion`s.
+    """
+    DataVersion.bump(tags)
+    backend = shared_ttl_cache()
+    if backend is None:
+        # the data versions are the tag versions. Other processes reread them
+        # within `TAG_VERSION_INTERVAL`, and this one does right away.
+        tag_versions.expire(tags)
+        return
+    # versions only need to be unique, not ordered, so a timestamp saves us a
+    # read-modify-write.
+    version = time.time_ns()
+    backend.set_many({tag_key(tag): version for tag in tags}, timeout=None)
+
+def ttl_cache(max_age, *, max_entries=1000, max_bytes=None, shared=True,
+    tags=None):
     """
     An @cache, but instead of caching indefinitely, only caches for `max_age`
     seconds.
@@ -154,7 +571,28 @@ def ttl_cache(max_age):
     call, the cached value is returned. Otherwise, the cached value is still
     returned, but the value is recomputed on a separate thread. This ensures
     that the user which triggers the recomputation will not experience a delay,
-    but *will* update the value for the next users.
+    but *will* update the value for the next users. Only one recomputation
+    runs at a time for any arguments; calls made while it is running also get
+    the stale value.
+
+    At most `max_entries` results, totalling at most `max_bytes` bytes (as
+    estimated by `sizeof`), are cached for the decorated function. Either can be
+    `None` for no limit. When a limit is exceeded, the least recently used
+    results are evicted.
+
+    If `TTL_CACHE_BACKEND` is configured, results are instead stored in that
+    cache and shared between processes, unless `shared` is false (eg for values
+    which are too expensive to pickle). `max_entries` and `max_bytes` don't
+    apply to shared results; the backend's own limits do.
+
+    `tags` are the tags (see `cache_tag`) of the data the result depends on, or
+    a function which is called with the same arguments as the decorated
+    function and returns them. When any of those tags is invalidated with
+    `invalidate_ttl_cache`, the result is treated as if `max_age` had passed:
+    its next call returns it, but starts a recomputation.
+
+    `function.warm(*args, **kwargs)` computes and caches a result ahead of time
+    (see `TTLCache.warm`), eg from the `warmcache` command.
 
     Warnings
     --------
@@ -163,37 +601,102 @@ def ttl_cache(max_age):
     cached for at *most* `max_age` seconds. This is to simplify implementation.
     """
     def decorator(function):
+        cache = TTLCache(function, max_age, max_entries, max_bytes, shared,
+            tags)
+        ttl_caches.append(cache)
 
         @wraps(function)
         def wrapper(*args, **kwargs):
-            time_salt = time.time() // max_age
-            # make kwargs hashable
-            frozen_kwargs = tuple(sorted(kwargs.items()))
-            key = (function, args, frozen_kwargs)
-            if key in _ttl_cache:
-                (time_salt_cached, value) = _ttl_cache[key]
-
-                if time_salt_cached < time_salt:
-
-                    # recompute the new value in a separate thread, but return
-                    # the cached value immediately so we don't delay the
-                    # response.
-                    def recompute():
-                        value = function(*args, **kwargs)
-                        _ttl_cache[key] = (time_salt, value)
-                    thread = Thread(target=recompute)
-                    thread.start()
-                    return value
-
-                return value
-
-            value = function(*args, **kwargs)
-            _ttl_cache[key] = (time_salt, value)
-            return value
+            return cache.get(args, kwargs)
 
+        wrapper.cache = cache
+        wrapper.warm = lambda *args, **kwargs: cache.warm(args, kwargs)
         return wrapper
     return decorator
 
+def sizeof(value):
+    """
+    An estimate of the memory used by `value` and everything it references, in
+    bytes. Objects referenced more than once are only counted once.
+    """
+    seen = set()
+    size = 0
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        size += sys.getsizeof(value)
+
+        if isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            stack.extend(value)
+        elif hasattr(value, "__dict__") and not isinstance(value, type):
+            stack.append(vars(value))
+    return size
+
+class JSONPayload:
+    """
+    A json response body, encoded once and kept both as is and gzipped. Caching
+    a `JSONPayload` instead of the data it encodes means serving a large
+    response costs neither a json encoding nor a compression per request.
+    """
+    def __init__(self, data):
+        self.identity = json.dumps(data, cls=DjangoJSONEncoder).encode()
+        self.gzip = gzip.compress(self.identity)
+
+    def __repr__(self):
+        return f"<JSONPayload ({len(self.identity)} bytes)>"
+
+    def response(self, request):
+        """
+        An `HttpResponse` of this payload, gzipped if the request's
+        `Accept-Encoding` allows it.
+        """
+        if accepts_gzip(request):
+            response = HttpResponse(self.gzip, content_type="application/json")
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(self.identity,
+                content_type="application/json")
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
+
+def accepts_gzip(request):
+    """
+    Whether `request`'s `Accept-Encoding` header allows a gzipped response.
+    """
+    accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    for coding in accept_encoding.split(","):
+        (coding, *params) = coding.split(";")
+        if coding.strip().lower() not in ["gzip", "*"]:
+            continue
+        quality = 1
+        for param in params:
+            (name, _, value) = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        # "gzip;q=0" explicitly refuses gzip
+        if quality > 0:
+            return True
+    return False
+
+@ttl_cache(24 * 60 * 60, tags=["pass_fail"])
+def pf_semesters():
+    """
+    The semesters in which UMD allowed students to take any course pass/fail.
+    To add a new pass/fail semester, add it to the `PassFailSemester` table.
+    """
+    # avoid circular imports
+    from home.models import PassFailSemester
+    return [pf.semester for pf in PassFailSemester.objects.order_by("semester")]
+
 def recompute_ttl_cache():
     # TODO this is an imperfect implementation because although this will
     # recompute all values in the ttl cache, it will take two calls per cached
@@ -201,11 +704,90 @@ def recompute_ttl_cache():
     # time_salt to 0 here and so will recompute the value, but it will return
     # the previously cached value before it does so. Only on the second call
     # will we return the truly updated value.
-    for key, value in _ttl_cache.copy().items():
-        (_time_salt, *values) = value
-        # set time_salt to 0 to force recomputation on next call
-        value = (0, *values)
-        _ttl_cache[key] = value
+    for cache in ttl_caches:
+        cache.expire()
+
+    # other processes can't see the expirations above, so bump the shared
+    # generation to make every entry everywhere stale.
+    backend = shared_ttl_cache()
+    if backend is not None:
+        # `incr` is atomic, but raises if the key doesn't exist yet.
+        backend.add(GENERATION_KEY, 0, timeout=None)
+        backend.incr(GENERATION_KEY)
+
+    # this is used after data was changed by hand, which we can't track, so
+    # assume everything changed.
+    tags = ["grade", "review", "catalog"]
+    DataVersion.bump(tags)
+    tag_versions.expire(tags)
+
+def data_version_condition(tags):
+    """
+    A decorator for a view's `get` method, which adds ETag and Last-Modified
+    headers derived from the `DataVersion`s of `tags` to its responses, and
+    answers conditional requests for unchanged data with a 304 before the
+    view runs.
+
+    `tags` is called with the request and returns the tags (see `cache_tag`)
+    of the data the response depends on.
+    """
+    def versions(request):
+        # the etag and last modified functions are called separately, but we
+        # only want to query for them once.
+        if not hasattr(request, "data_versions"):
+            request.data_versions = DataVersion.current(tags(request))
+        return request.data_versions
+
+    def etag(request, *_args, **_kwargs):
+        (versions_, _modified) = versions(request)
+        return hashlib.sha1(versions_.encode()).hexdigest()
+
+    def last_modified(request, *_args, **_kwargs):
+        (_versions, modified) = versions(request)
+        return modified
+
+    return method_decorator(condition(etag_func=etag,
+        last_modified_func=last_modified))
+
+class PageCache:
+    """
+    Caches rendered fragments of a page (see the `page_cache` template tag) for
+    anonymous users, until the data version of any tag returned by `tags()`
+    changes. Logged in users always get the page rendered live, since they may
+    see moderator tools or their own data inside these fragments.
+
+    The cache is shared between processes if `TTL_CACHE_BACKEND` is set.
+    """
+    # anything not covered by a data version (eg the current semester) is
+    # at most this stale.
+    TIMEOUT = 24 * 60 * 60
+
+    def __init__(self, request, name, tags):
+        self.key = None
+        if request.user.is_authenticated:
+            return
+
+        (versions, _modified) = DataVersion.current(tags())
+        # our templates also change with the color scheme
+        color_scheme = request.session.get("color_scheme")
+        key = f"{name}:{versions}:{color_scheme}"
+        self.key = hashlib.sha1(key.encode()).hexdigest()
+
+    def render(self, fragment, render):
+        """
+        Returns `render()`, from the cache if this page is cacheable and the
+        fragment has been rendered before.
+        """
+        if self.key is None:
+            return render()
+
+        backend = shared_ttl_cache() or caches["default"]
+        key = f"page_cache:{self.key}:{fragment}"
+        html = backend.get(key)
+        if html is None:
+            html = render()
+            backend.set(key, html, self.TIMEOUT)
+        return mark_safe(html)
 
 def send_updates_webhook(request):
     # avoid circular imports
@@ -11,13 +11,14 @@ from django.urls import reverse
 from crispy_forms.utils import render_crispy_form
 from discord_webhook import DiscordWebhook, DiscordEmbed
 
-from home.models import Review, Professor, ProfessorAlias, ProfessorCourse, Grade, User
+from home.models import (Review, Professor, ProfessorAlias, ProfessorCourse,
+    Grade, User, update_grade_rollups, invalidate_caches)
 from home.utils import AdminAction
 from home.tables.reviews_table import UnverifiedReviewsTable
 from home.tables.basic import ProfessorsTable
 from home.forms.admin_forms import (ProfessorMergeForm, ProfessorSlugForm,
     ProfessorUpdateForm, ActionForm, ProfessorInfoModal)
-from home.utils import send_email, _ttl_cache, create_autoslug
+from home.utils import send_email, ttl_caches, create_autoslug
 from planetterp import config
 
 class Admin(PermissionRequiredMixin, View):
@@ -37,10 +38,11 @@ class Admin(PermissionRequiredMixin, View):
         action_form = ActionForm()
 
         ttl_cache_items = []
-        for key, item in _ttl_cache.items():
-            # [key, time_salt, value]
-            val = [key, item[0], item[1]]
-            ttl_cache_items.append(val)
+        for cache in ttl_caches:
+            for key, time_salt, value in cache.items():
+                # [function, key, time_salt, value]
+                val = [cache.name, key, time_salt, value]
+                ttl_cache_items.append(val)
 
         context = {
             "reviews": reviews,
@@ -49,6 +51,7 @@ class Admin(PermissionRequiredMixin, View):
             "professors_table": professors_table,
             "action_form": action_form,
             "merge_professor_form": merge_professor_form,
+            "ttl_caches": ttl_caches,
             "ttl_cache_items": ttl_cache_items
         }
 
@@ -174,6 +177,12 @@ class Admin(PermissionRequiredMixin, View):
                 reviews.filter(professor__id=subject_id).update(professor=merge_target)
                 grades.filter(professor__id=subject_id).update(professor=merge_target)
                 professor_aliases.filter(professor=merge_subject).update(professor=merge_target)
+                update_grade_rollups(professors=[merge_subject, merge_target])
+                # `update` doesn't send the signals which would invalidate
+                # these.
+                merged = [merge_subject.pk, merge_target.pk]
+                invalidate_caches("grade", professors=merged)
+                invalidate_caches("review", professors=merged)
 
                 aliases = professor_aliases.filter(alias=merge_subject.name)
                 if not (aliases.exists() or professors.filter(name=merge_subject.name).count() > 1):
@@ -343,6 +352,7 @@ class Admin(PermissionRequiredMixin, View):
             if verified_status is Professor.Status.REJECTED:
                 reviews = Review.unfiltered.filter(professor__id=professor.pk)
                 reviews.update(status=verified_status)
+                invalidate_caches("review", professors=[professor.pk])
 
         professor.status = verified_status
         professor.save()
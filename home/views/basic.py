@@ -76,7 +76,7 @@ class CourseReviews(View):
 class Index(View):
 
     @staticmethod
-    @ttl_cache(24 * 60 * 60 * 7)
+    @ttl_cache(24 * 60 * 60 * 7, tags=["catalog", "review", "grade"])
     def get_counts():
         num_courses = Course.unfiltered.count()
         num_professors = Professor.verified.count()
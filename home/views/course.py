@@ -4,9 +4,10 @@ from collections import defaultdict
 from django.shortcuts import render, redirect
 from django.http import Http404
 from django.views import View
-from django.db.models import Count, Q, Sum, FloatField, F
+from django.db.models import F
 
-from home.models import Course as CourseModel, Review
+from home.models import Course as CourseModel
+from home.utils import PageCache, cache_tag
 
 class Course(View):
     template = "course.html"
@@ -27,35 +28,35 @@ class Course(View):
             .exclude(pk=course.id)
         )
 
-        # calculate average rating for all professors as an optimization. Store
-        # in `average_rating_` so we don't accidentaly access `average_rating`
-        # and compute the average rating per professor. The template will need
-        # to be careful of this as well
+        def tags():
+            # the page shows each professor's overall average rating, not just
+            # for this course.
+            slugs = course.professors.values_list("slug", flat=True)
+            return ["catalog", cache_tag("grade", "course", course.name),
+                cache_tag("review", "course", course.name),
+                *[cache_tag("review", "professor", slug) for slug in slugs
+                    if slug]]
+
+        # everything below is only computed if the page isn't cached, so it's
+        # passed as callables, which templates call when rendering.
+        context = {
+            "course": course,
+            "sister_courses": sister_courses,
+            "course_description": lambda: self.course_description(course),
+            "grouped_professors": lambda: self.grouped_professors(course),
+            "page_cache": PageCache(request, f"course:{course.pk}", tags)
+        }
+        return render(request, self.template, context)
+
+    @staticmethod
+    def grouped_professors(course):
+        # calculate average rating for all professors as an optimization. The
+        # template will need to be careful to use `average_rating_` instead of
+        # `average_rating`.
         professors = (
             course
             .professors.all()
-            .annotate(
-                num_reviews=Count(
-                    "review",
-                    filter=Q(review__status=Review.Status.VERIFIED),
-                )
-            )
-            .annotate(
-                # TODO consolidate this with the Professor#average_rating
-                # method, will likely require a new Professors queryset
-                average_rating_= (
-                    Sum(
-                        "review__rating",
-                        output_field=FloatField(),
-                        filter=Q(review__status=Review.Status.VERIFIED)
-                    )
-                    /
-                    Count(
-                        "review",
-                        filter=Q(review__status=Review.Status.VERIFIED)
-                    )
-                )
-            )
+            .average_rating_annotate()
             .annotate(
                 semester_taught=F("professorcourse__semester_taught")
             )
@@ -71,19 +72,6 @@ class Course(View):
             else:
                 past_professors.append(professor)
 
-        course_description = course.description
-        courses_replaced = []
-
-        if course_description:
-            course_code_format = CourseModel.course_code_format
-            matches = re.findall(course_code_format,course_description)
-
-            for word in matches:
-                if not word in courses_replaced and CourseModel.recent.filter(name=word).first():
-                    course_description = course_description.replace(word, '<a href="/course/{0}">{0}</a>'.format(word))
-                    courses_replaced.append(word)
-            course.description = course_description
-
         def key(item):
             return item[0].number()
 
@@ -97,9 +85,20 @@ class Course(View):
         if past_professors:
             grouped_professors["Past Semesters"] = past_professors
 
-        context = {
-            "course": course,
-            "sister_courses": sister_courses,
-            "grouped_professors": grouped_professors
-        }
-        return render(request, self.template, context)
+        return grouped_professors
+
+    @staticmethod
+    def course_description(course):
+        course_description = course.description
+        courses_replaced = []
+
+        if course_description:
+            course_code_format = CourseModel.course_code_format
+            matches = re.findall(course_code_format,course_description)
+
+            for word in matches:
+                if not word in courses_replaced and CourseModel.recent.filter(name=word).first():
+                    course_description = course_description.replace(word, '<a href="/course/{0}">{0}</a>'.format(word))
+                    courses_replaced.append(word)
+
+        return course_description
@@ -1,14 +1,41 @@
 from django.http import JsonResponse
-from django.db.models import Sum
 from django.http import Http404
 from django.views import View
 from django.urls import reverse
 
 from home.models import Professor, Grade, Course, Gened
-from home.utils import ttl_cache, Semester
+from home import queries
+from home.grade_matrix import grade_matrix
+from home.utils import (ttl_cache, Semester, pf_semesters, cache_tag,
+    data_version_condition, JSONPayload)
+
+
+# the ttl cache tags of `GradeData._grade_data`
+def _grade_data_tags(professor, course, _semester, _section, _pf_semesters):
+    tags = ["pass_fail"]
+    if professor:
+        tags += ["catalog", cache_tag("grade", "professor", professor)]
+    if course:
+        tags.append(cache_tag("grade", "course", course))
+    if not (professor or course):
+        tags.append("grade")
+    return tags
+
+# the ttl cache tags of `GradeData._course_grade_data`
+def _course_grade_data_tags(professor, _pf_semesters):
+    return ["catalog", "pass_fail", cache_tag("grade", "professor", professor)]
+
+def _grade_data_request_tags(request):
+    data = request.GET
+    professor = data.get("professor", None)
+    if data.get("professor_courses", False):
+        return _course_grade_data_tags(professor, None)
+    return _grade_data_tags(professor, data.get("course", None), None, None,
+        None)
 
 
 class GradeData(View):
+    @data_version_condition(_grade_data_request_tags)
     def get(self, request):
         data = request.GET
         professor = data.get("professor", None)
@@ -19,25 +46,10 @@ class GradeData(View):
         pf_semesters = data.get("pf_semesters", False) == "true"
 
         if professor_courses:
-            grade_data = GradeData._course_grade_data(professor, pf_semesters)
-            data = {
-                "professor_slug": grade_data.pop("professor_slug"),
-                "average_gpa": grade_data.pop("average_gpa"),
-                "num_students": grade_data.pop("num_students"),
-                "data": {}
-            }
-
-            for course_name, course_data in grade_data.items():
-                (course_average_gpa, course_num_students, course_grades) = course_data
-
-                if course_num_students and course_average_gpa:
-                    data['data'][course_name] = GradeData._get_data(
-                        course_average_gpa, course_num_students, course_grades)
+            data = GradeData.compose_course_grade_data(professor, pf_semesters)
         else:
-            (average_gpa, num_students, grades) = GradeData._grade_data(professor,
-                course, semester, section, pf_semesters)
-
-            data = GradeData._get_data(average_gpa, num_students, grades)
+            data = GradeData.compose_grade_data(professor, course, semester,
+                section, pf_semesters)
 
         return JsonResponse(data)
 
@@ -75,9 +87,18 @@ class GradeData(View):
         }
 
     @staticmethod
+    @ttl_cache(24 * 60 * 60 * 7, max_bytes=32 * 1024 * 1024,
+        tags=_course_grade_data_tags)
     def _course_grade_data(professor, pf_semesters):
         professor = Professor.verified.filter(name=professor).first()
-        courses = professor.course_set.all().order_by("name")
+        # a professor has a `ProfessorCourse` for every semester they taught a
+        # course, so their courses repeat.
+        courses = (
+            professor.course_set
+            .order_by("name")
+            .values_list("name", flat=True)
+            .distinct()
+        )
         grades = professor.grade_set(manager="recent").all()
 
         if not pf_semesters:
@@ -88,21 +109,46 @@ class GradeData(View):
             "average_gpa": grades.average_gpa(),
             "num_students": grades.num_students()
         }
-        for course in courses:
-            course_grades = grades
-            course_grades = course_grades.filter(course=course)
 
-            average_course_gpa = course_grades.average_gpa()
-            num_course_students = course_grades.num_students()
-            course_grades = course_grades.grade_totals_aggregate()
+        # compute every course's statistics in one grouped query instead of
+        # three aggregate queries per course.
+        course_values = {
+            value["course__name"]: value
+            for value in grades.grade_data_by("course__name")
+        }
+        for course_name in courses:
+            if course_name not in course_values:
+                continue
+            values = course_values[course_name]
+            course_grades = {f"{field}_total": values[f"{field}_total"]
+                for field in Grade.GRADE_FIELDS}
 
-            grade_data[course.name] = (average_course_gpa, num_course_students, course_grades)
+            grade_data[course_name] = (values["average_gpa"],
+                values["num_students"], course_grades)
 
         return grade_data
 
+    # keyed by every combination of filters users request, so this has many
+    # more (small) entries than most. Allow more than the default number of
+    # entries, and bound it by memory instead.
     @staticmethod
-    @ttl_cache(24 * 60 * 60 * 7)
+    @ttl_cache(24 * 60 * 60 * 7, max_entries=10_000,
+        max_bytes=64 * 1024 * 1024, tags=_grade_data_tags)
     def _grade_data(professor, course, semester, section, pf_semesters):
+        matrix = grade_matrix()
+        if matrix is not None:
+            grades = matrix.aggregate(
+                recent=not semester,
+                exclude_pf=not pf_semesters,
+                professor=professor or None,
+                course=course or None,
+                semester=Semester(semester) if semester else None,
+                section=section or None
+            )
+            average_gpa = grades.pop("average_gpa")
+            num_students = grades.pop("num_students")
+            return (average_gpa, num_students, grades)
+
         # if we want a specific semester, grab all grades to start; we'll filter
         # down to that specific semester later, and don't want to return no data
         # for a request for an old (non-recent) semester.
@@ -139,7 +185,8 @@ class GradeData(View):
 
     @staticmethod
     def compose_course_grade_data(professor, pf_semesters):
-        grade_data = GradeData._course_grade_data(professor, pf_semesters)
+        # copy, as the cached dict is shared between calls
+        grade_data = dict(GradeData._course_grade_data(professor, pf_semesters))
         data = {
             "professor_slug": grade_data.pop("professor_slug"),
             "average_gpa": grade_data.pop("average_gpa"),
@@ -157,30 +204,41 @@ class GradeData(View):
 
 
 
+class PassFailSemesterData(View):
+    def get(self, _request):
+        data = [str(semester.number()) for semester in pf_semesters()]
+        return JsonResponse({"data": data})
+
+
+# these are large (every recent course), so they're cached as the final response
+# bodies.
 class CourseDifficultyData(View):
-    def get(self, _request, type_):
+    def get(self, request, type_):
         if type_ == "courses":
-            data = self._course_data()
-        if type_ == "departments":
-            data = self._departments_data()
+            payload = self._course_data()
+        elif type_ == "departments":
+            payload = self._departments_data()
+        else:
+            raise Http404()
 
-        return JsonResponse({"data": data})
+        return payload.response(request)
 
     @staticmethod
-    @ttl_cache(24 * 60 * 60 * 7)
+    @ttl_cache(24 * 60 * 60 * 7, tags=["grade", "pass_fail"])
     def _course_data():
-        data = []
-
-        values = (
-            Grade.recent
-            .exclude_pf()
-            .values("course__name", total_students=Sum("num_students"))
-            .filter(total_students__gte=100)
-            .average_gpa_annotate()
-        )
+        matrix = grade_matrix()
+        if matrix is not None:
+            values = matrix.grade_data_by("course__name", recent=True,
+                exclude_pf=True)
+        else:
+            values = Grade.recent.exclude_pf().grade_data_by("course__name")
 
         data = []
         for value in values:
+            num_students = value["num_students"]
+            if num_students < 100:
+                continue
+
             average_gpa = value["average_gpa"]
             # some courses with entirely "other" graded students have a gpa of
             # 0. Other courses with weirder circumstances (citation needed)
@@ -199,38 +257,22 @@ class CourseDifficultyData(View):
             # tradeoff.
             href = reverse("course", kwargs={"name": course_name})
             course_name = f"<a href='{href}' target='_blank'>{course_name}</a>"
-            num_students = value["total_students"]
 
             entry = [course_name, average_gpa, num_students]
             data.append(entry)
 
-        return data
+        return JSONPayload({"data": data})
 
     @staticmethod
-    @ttl_cache(24 * 60 * 60 * 7)
+    @ttl_cache(24 * 60 * 60 * 7, tags=["grade", "pass_fail"])
     def _departments_data():
-        departments = (
-            Grade.recent
-            .exclude_pf()
-            .values("course__department").distinct()
-            .annotate(num_students=Sum("num_students"))
-            .filter(num_students__gte=100)
-        )
-
         data = []
-        for department in departments:
-            department_name = department["course__department"]
-            average_gpa = (
-                Grade.recent
-                .filter(course__department=department_name)
-                .exclude_pf()
-                .average_gpa()
-            )
-            href = reverse("search") + f"?query={department_name}"
-            dep_link = f"<a href='{href}' target='_blank'>{department_name}</a>"
-            entry = [dep_link, f"{average_gpa:.2f}", department["num_students"]]
+        for (department, average_gpa, num_students) in queries.department_grades():
+            href = reverse("search") + f"?query={department}"
+            dep_link = f"<a href='{href}' target='_blank'>{department}</a>"
+            entry = [dep_link, f"{average_gpa:.2f}", num_students]
             data.append(entry)
-        return data
+        return JSONPayload({"data": data})
 
 
 class GenedData(View):
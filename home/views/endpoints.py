@@ -2,7 +2,7 @@ from django.http import JsonResponse
 from django.views import View
 from django.http import Http404
 
-from home import queries
+from home.autocomplete import autocomplete_index
 
 class Autocomplete(View):
     def get(self, request):
@@ -16,8 +16,8 @@ class Autocomplete(View):
         professors = "professor" in types
         courses = "course" in types
         return_attrs = data.getlist("return_attrs[]")
-        search_results = queries.search(query, 10, professors=professors,
-            courses=courses)
+        search_results = autocomplete_index().search(query, 10,
+            professors=professors, courses=courses)
         results = []
 
         for result in search_results:
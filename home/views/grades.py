@@ -7,6 +7,7 @@ from crispy_forms.utils import render_crispy_form
 
 from home.forms.basic import HistoricCourseGradeForm, HistoricProfessorGradeForm
 from home.views.data_sources import GradeData
+from home.utils import pf_semesters
 
 
 class Grades(View):
@@ -15,7 +16,9 @@ class Grades(View):
     def get(self, request):
         context = {
             "course_form": HistoricCourseGradeForm(),
-            "professor_form": HistoricProfessorGradeForm()
+            "professor_form": HistoricProfessorGradeForm(),
+            "pf_semesters": [str(semester.number()) for semester in
+                pf_semesters()]
         }
         return render(request, self.template_name, context)
 
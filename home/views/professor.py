@@ -1,8 +1,10 @@
+from functools import cache
+
 from django.views import View
 from django.shortcuts import render
 from django.http import Http404, JsonResponse
 
-from home.utils import send_updates_webhook
+from home.utils import send_updates_webhook, PageCache, cache_tag
 from home.forms.professor_forms import ProfessorFormReview
 from home.models import Professor as ProfessorModel, Review, Course
 from home.tables.reviews_table import VerifiedReviewsTable
@@ -27,8 +29,6 @@ class Professor(View):
             .order_by("-created_at")
         )
 
-        reviews_table = VerifiedReviewsTable(reviews, request)
-
         courses_taught = (
             Course.recent
             .filter(professors__pk=professor.pk)
@@ -36,27 +36,41 @@ class Professor(View):
             .distinct()
         )
 
-        courses_reviewed = []
-        values = (
-            reviews
-            .order_by("course__name")
-            .values("course__name")
-            .distinct()
-        )
-        for value in values:
-            # filter out None values
-            if not value["course__name"]:
-                continue
-            courses_reviewed.append(value["course__name"])
-
-        values = (
-            professor.grade_set(manager="recent")
-            .order_by("course__name")
-            .values("course__name")
-            .distinct()
-        )
-        courses_graded = [value["course__name"] for value in values]
-
+        @cache
+        def num_reviews():
+            return reviews.count()
+
+        def courses_reviewed():
+            courses_reviewed = []
+            values = (
+                reviews
+                .order_by("course__name")
+                .values("course__name")
+                .distinct()
+            )
+            for value in values:
+                # filter out None values
+                if not value["course__name"]:
+                    continue
+                courses_reviewed.append(value["course__name"])
+            return courses_reviewed
+
+        def courses_graded():
+            values = (
+                professor.grade_set(manager="recent")
+                .order_by("course__name")
+                .values("course__name")
+                .distinct()
+            )
+            return [value["course__name"] for value in values]
+
+        def tags():
+            return ["catalog", cache_tag("review", "professor", professor.slug),
+                cache_tag("grade", "professor", professor.slug)]
+
+        # everything which is only shown inside a cached fragment is passed as
+        # a callable, which templates call when rendering, so it's only
+        # computed if the page isn't cached.
         context = {
             "user": user,
             "professor": professor,
@@ -64,8 +78,10 @@ class Professor(View):
             "courses_taught": courses_taught,
             "courses_reviewed": courses_reviewed,
             "courses_graded": courses_graded,
-            "reviews_table": reviews_table,
-            "num_reviews": reviews.count()
+            "reviews_table": lambda: VerifiedReviewsTable(reviews, request),
+            "num_reviews": num_reviews,
+            "page_cache": PageCache(request, f"professor:{professor.pk}",
+                tags)
         }
 
         if request.user.has_perm("home.mod"):
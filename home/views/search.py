@@ -21,7 +21,9 @@ class Search(View):
         if any(character.isdigit() for character in query):
             query = query.replace(" ", "")
 
-        results = queries.search(query, 30, courses=True, professors=True)
+        fuzzy = data.get("fuzzy") == "true"
+        results = queries.search(query, 30, courses=True, professors=True,
+            fuzzy=fuzzy)
 
         if len(results) == 1:
             result = results[0]
@@ -35,6 +37,8 @@ class Search(View):
                 return redirect(result)
 
         context = {
-            "results": results
+            "results": results,
+            "query": query,
+            "fuzzy": fuzzy
         }
         return render(request, "search.html", context)
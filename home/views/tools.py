@@ -1,13 +1,14 @@
 import math
 
 from django.http import HttpResponseBadRequest, JsonResponse
-from django.db.models import Count, Sum, Q, FloatField
+from django.db.models import Sum
 from django.views.generic import TemplateView
 from django.shortcuts import render
 from django.views import View
 
 from home.models import Grade, Course, Review, Professor
 from home.utils import ttl_cache
+from home.grade_matrix import grade_matrix
 
 class Tools(TemplateView):
     template_name = "tools.html"
@@ -29,13 +30,19 @@ class ToolPopularCourses(TemplateView):
             return HttpResponseBadRequest("Your search must be at least 3 "
                 "characters.")
 
-        values = (
-            Grade.recent
-            .filter(course__name__icontains=query)
-            .values("course__name")
-            .annotate(num_students=Sum("num_students"))
-            .order_by("-num_students")
-        )
+        matrix = grade_matrix()
+        if matrix is not None:
+            values = matrix.grade_data_by("course__name", recent=True,
+                course_contains=query)
+            values.sort(key=lambda value: value["num_students"], reverse=True)
+        else:
+            values = (
+                Grade.recent
+                .filter(course__name__icontains=query)
+                .values("course__name")
+                .annotate(num_students=Sum("num_students"))
+                .order_by("-num_students")
+            )
 
         if not values:
             return HttpResponseBadRequest("No results.")
@@ -60,22 +67,29 @@ class ToolGradeInflation(TemplateView):
         if len(search) not in [0, 4, 5, 6, 7, 8]:
             return HttpResponseBadRequest("Invalid department or course.")
 
+        matrix = grade_matrix()
+        filters = {}
         grades = Grade.unfiltered.all()
         if len(search) == 4:
+            filters["department"] = search
             grades = grades.filter(course__department=search)
         if len(search) > 4:
-            course = Course.recent.filter(name=search).first()
-            if not course:
+            if matrix is not None:
+                course_exists = matrix.has_recent_course(search)
+            else:
+                course = Course.recent.filter(name=search).first()
+                course_exists = course is not None
+                grades = course and course.grade_set.all()
+            if not course_exists:
                 return HttpResponseBadRequest("Course does not exist.")
 
-            grades = course.grade_set.all()
+            filters["course"] = search
+
+        if matrix is not None:
+            values = matrix.grade_data_by("semester", **filters)
+        else:
+            values = grades.grade_data_by("semester")
 
-        values = (
-            grades
-            .values("semester")
-            .average_gpa_annotate()
-            .order_by("semester")
-        )
         # [labels, data]
         dist = [[], []]
         for value in values:
@@ -103,28 +117,10 @@ class ToolStatistics(View):
         return render(request, "statistics.html", context)
 
     @staticmethod
-    @ttl_cache(24 * 60 * 60)
+    @ttl_cache(24 * 60 * 60, tags=["catalog", "review"])
     def graph_data():
         reviews = Review.verified.all()
-        professors = (
-            Professor.verified
-            .annotate(
-                # TODO consolidate this with the Professor#average_rating
-                # method, will likely require a new Professors queryset
-                average_rating_= (
-                    Sum(
-                        "review__rating",
-                        output_field=FloatField(),
-                        filter=Q(review__status=Review.Status.VERIFIED)
-                    )
-                    /
-                    Count(
-                        "review",
-                        filter=Q(review__status=Review.Status.VERIFIED)
-                    )
-                )
-            )
-        )
+        professors = Professor.verified.average_rating_annotate()
 
         review_ratings = [0] * 5
         # not a typo - there are actually 53 weeks in an isocalendar year.
@@ -124,6 +124,20 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/3.2/ref/settings/#caches
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# shared between worker processes by `ttl_cache` (see home/utils.py)
+if getattr(config, "TTL_CACHE_BACKEND", None):
+    CACHES['ttl_cache'] = config.TTL_CACHE_BACKEND
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
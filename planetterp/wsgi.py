@@ -8,9 +8,15 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
 import os
+from threading import Thread
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'planetterp.settings')
 
 application = get_wsgi_application()
+
+# build the autocomplete index in the background, so the first search after a
+# restart doesn't have to wait for it.
+from home.autocomplete import autocomplete_index
+Thread(target=autocomplete_index, daemon=True).start()